@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Admission of query results to the cache, so that one-off and cheap queries do not evict hot entries.
+
+With admission_min_seen set, the results of a query are only stored once it has missed the cache at least that
+many times recently in this process. Misses are counted in a TinyLFU style count-min sketch of
+admission_sketch_width counters per row, whose counters are halved after every 10 * admission_sketch_width misses
+so that old queries are forgotten. Queries are counted by their sql rather than their cache key, so that counts
+survive the invalidation of their tables. With admission_min_db_time set, results are only stored when the database
+query took at least that many milliseconds. Both options can be set for models and query sets as well.
+
+    DJANGO_CACHE_MANAGER = {
+        'admission_min_seen': 2,
+        'admission_min_db_time': 5,
+    }
+"""
+import hashlib
+import logging
+import threading
+
+from . import conf
+
+
+logger = logging.getLogger(__name__)
+
+_DEPTH = 4
+# counters saturate at 15, as the 4 bit counters of TinyLFU
+_MAX_COUNT = 15
+
+
+class FrequencySketch(object):
+    """
+    Count-min sketch of the recent frequency of cache keys. Keys are md5 hex digests, whose parts are used as the
+    hashes of the rows.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self._lock = threading.Lock()
+        self._rows = [bytearray(width) for row in range(_DEPTH)]
+        self._additions = 0
+
+    def increment(self, key):
+        """
+        Count key and return its estimated frequency, including this occurrence.
+        """
+        positions = self._positions(key)
+        with self._lock:
+            count = min(row[position] for row, position in zip(self._rows, positions))
+            if count < _MAX_COUNT:
+                # conservative update: only the smallest counters are incremented
+                for row, position in zip(self._rows, positions):
+                    if row[position] == count:
+                        row[position] = count + 1
+                count += 1
+            self._additions += 1
+            if self._additions >= 10 * self.width:
+                self._age()
+        return count
+
+    def _positions(self, key):
+        return [int(key[row * 8:(row + 1) * 8], 16) % self.width for row in range(_DEPTH)]
+
+    def _age(self):
+        self._rows = [bytearray(count >> 1 for count in row) for row in self._rows]
+        self._additions = 0
+
+
+_sketch = None
+_sketch_lock = threading.Lock()
+
+
+def get_sketch():
+    global _sketch
+    width = conf.get_setting('admission_sketch_width', 16384)
+    if _sketch is None or _sketch.width != width:
+        with _sketch_lock:
+            if _sketch is None or _sketch.width != width:
+                _sketch = FrequencySketch(width)
+    return _sketch
+
+
+def admit(queryset, key, db_time):
+    """
+    Whether the result of a query that missed the cache is stored.
+
+    Parameters
+    ~~~~~~~~~~
+    queryset
+        The CachingQuerySet
+    key
+        Cache key of the query
+    db_time
+        Time of the database query in seconds
+    """
+    min_seen = queryset.get_cache_option('admission_min_seen')
+    if min_seen and min_seen > 1 and get_sketch().increment(query_digest(queryset)) < min_seen:
+        logger.debug('not caching key %s, not seen %s times', key, min_seen)
+        return False
+    min_db_time = queryset.get_cache_option('admission_min_db_time')
+    if min_db_time and db_time * 1000 < min_db_time:
+        logger.debug('not caching key %s, database query took %.3f ms', key, db_time * 1000)
+        return False
+    return True
+
+
+def query_digest(queryset):
+    """
+    Digest of the query of queryset, unlike its cache key independent of the generations of its tables.
+    """
+    opts = queryset.model._meta
+    query = u'{0}.{1}{2}{3}'.format(opts.app_label, opts.object_name, queryset._cache_sql, queryset.cache_database())
+    return hashlib.md5(query.encode('utf-8')).hexdigest()
+
+
+def reset():
+    global _sketch
+    with _sketch_lock:
+        _sketch = None
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive bypass of tables that are written so often that their cached results are rarely read before they are
+invalidated.
+
+Writes and cache hits of each table are counted by this process in windows of adaptive_bypass_window seconds. At
+the end of a window with at least adaptive_bypass_min_writes writes and fewer than adaptive_bypass_min_reuse hits
+per write, queries of the table are served from the database without reading or storing cached results for the
+next window. Caching resumes after a window with fewer writes. Bypassed queries are counted as 'bypass' in stats.
+Writes are only counted when adaptive_bypass is set globally or for a model, and tables without writes or hits for
+two windows are forgotten.
+
+    DJANGO_CACHE_MANAGER = {
+        'adaptive_bypass': True,
+        'adaptive_bypass_window': 60,
+        'adaptive_bypass_min_writes': 20,
+        'adaptive_bypass_min_reuse': 1.0,
+    }
+"""
+import logging
+import threading
+import time
+
+from . import conf
+
+
+logger = logging.getLogger(__name__)
+
+
+class TableActivity(object):
+
+    def __init__(self, now):
+        self.started = now
+        self.writes = 0
+        self.hits = 0
+        self.bypassed = False
+
+
+class BypassTracker(object):
+    """
+    Writes, hits and bypass decisions of tables in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._pruned = time.time()
+
+    def record_write(self, table_name):
+        if not adaptive_bypass_enabled():
+            return
+        with self._lock:
+            self._activity(table_name).writes += 1
+
+    def record_hit(self, table_name):
+        with self._lock:
+            self._activity(table_name).hits += 1
+
+    def is_bypassed(self, table_name):
+        with self._lock:
+            return self._activity(table_name).bypassed
+
+    def bypassed_tables(self):
+        with self._lock:
+            return sorted(table_name for table_name in self._tables if self._activity(table_name).bypassed)
+
+    def reset(self):
+        with self._lock:
+            self._tables = {}
+
+    def _activity(self, table_name):
+        now = time.time()
+        window = conf.get_setting('adaptive_bypass_window', 60)
+        if now - self._pruned >= window:
+            self._prune(now, window)
+        activity = self._tables.get(table_name)
+        if activity is None:
+            activity = self._tables[table_name] = TableActivity(now)
+            return activity
+        elapsed = now - activity.started
+        if elapsed < window:
+            return activity
+        # the counts are of the last window only if it ended less than a window ago
+        if elapsed < 2 * window:
+            bypassed = (activity.writes >= conf.get_setting('adaptive_bypass_min_writes', 20) and
+                        activity.hits < activity.writes * conf.get_setting('adaptive_bypass_min_reuse', 1.0))
+        else:
+            bypassed = False
+        if bypassed != activity.bypassed:
+            logger.info('%s caching of table %s after %s writes and %s hits',
+                        'bypassing' if bypassed else 'resuming', table_name, activity.writes, activity.hits)
+        activity.started = now
+        activity.writes = activity.hits = 0
+        activity.bypassed = bypassed
+        return activity
+
+    def _prune(self, now, window):
+        """
+        Forget tables whose last window ended a window ago or earlier, they are not bypassed in the next window.
+        """
+        for table_name in [table_name for table_name, activity in self._tables.items()
+                           if now - activity.started >= 2 * window]:
+            del self._tables[table_name]
+        self._pruned = now
+
+
+def adaptive_bypass_enabled():
+    """
+    Whether adaptive_bypass is set globally or for any model.
+    """
+    if conf.get_setting('adaptive_bypass', False):
+        return True
+    model_options = conf.get_setting('models', {}).values()
+    return any(options.get('adaptive_bypass', False) for options in model_options)
+
+
+tracker = BypassTracker()
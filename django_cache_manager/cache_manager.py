@@ -1,15 +1,35 @@
 # -*- coding: utf-8 -*-
+import functools
 import logging
+import time
 
 from django.db import models
 from django.db.models.query import QuerySet
 from django.db.models.sql import EmptyResultSet
+try:
+    from django.db.models.query import ModelIterable
+except ImportError:
+    # django < 1.9 returns model instances from CachingQuerySet and uses other query set classes for values
+    ModelIterable = None
 
+from . import admission, conf, hooks, stats, transactions
+from .bypass import tracker as bypass_tracker
+from .circuit_breaker import FAILED, breaker
+from .generations import fresh_generations
+from .host_cache import get_host_cache
+from .lazy import LazyResultSet, dump_chunks
+from .replicas import random_replica_key, replica_keys
 from .mixins import (
     CacheBackendMixin,
     CacheInvalidateMixin,
     CacheKeyMixin,
 )
+from .refresh_ahead import (
+    access_counter,
+    refresher,
+)
+from .types import CachedResult, ChunkedResult, EmptyResult
+from .warmup import recorder
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +51,9 @@ class CacheManager(CacheInvalidateMixin, models.Manager):
     def get_queryset(self):
         return CachingQuerySet(self.model, using=self._db)
 
+    def cache_options(self, **options):
+        return self.get_queryset().cache_options(**options)
+
 
 class CachingQuerySet(CacheBackendMixin, CacheKeyMixin, CacheInvalidateMixin, QuerySet):
     """
@@ -38,22 +61,299 @@ class CachingQuerySet(CacheBackendMixin, CacheKeyMixin, CacheInvalidateMixin, Qu
     so that the results can be cached for future calls.
 
     Query set invalidates model cache for any calls to bulk_create or update.
+
+    Options from django_cache_manager.conf can be overridden for a single query set with cache_options.
     """
 
+    def cache_options(self, **options):
+        """
+        Returns a new query set with options overriding model and global options, e.g.
+        Car.objects.prefetch_related('make').cache_options(cache_prefetch=True)
+        """
+        clone = self._clone()
+        clone._cache_options = dict(self._cache_options, **options)
+        return clone
+
     def iterator(self):
+        measurement = stats.measure(self)
+        adaptive_bypass = self.get_cache_option('adaptive_bypass', False)
+        if adaptive_bypass and bypass_tracker.is_bypassed(self.model._meta.db_table):
+            result_set = super(CachingQuerySet, self).iterator()
+            if measurement:
+                result_set = list(result_set)
+                measurement.lap('db')
+                measurement.finish('bypass')
+            for result in result_set:
+                yield result
+            return
+        if hooks.active:
+            hooks.before('key_generation', queryset=self)
         try:
             key = self.generate_key()
         # workaround for Django bug # 12717
         except EmptyResultSet:
+            if hooks.active:
+                hooks.after('key_generation', queryset=self, key=None)
+            if measurement:
+                measurement.finish('empty')
             return
-        result_set = self.cache_backend.get(key)
+        if hooks.active:
+            hooks.after('key_generation', queryset=self, key=key)
+        transaction_state = None
+        if self.get_cache_option('transaction_aware', False):
+            transaction_state = transactions.get_state(self.db)
+        if transaction_state is not None and transaction_state.is_dirty(self.model._meta.db_table):
+            # rows written by the transaction are neither read from nor stored in the shared cache
+            result_set = transaction_state.get_local(key)
+            if result_set is None:
+                result_set = list(super(CachingQuerySet, self).iterator())
+                transaction_state.set_local(key, result_set)
+            if measurement:
+                measurement.lap('db')
+                measurement.finish('bypass')
+            for result in result_set:
+                yield result
+            return
+        if hooks.active:
+            hooks.before('cache_get', queryset=self, key=key)
+        if measurement:
+            measurement.lap('key_generation')
+        recorder.record(self)
+        result_set = None
+        entry = None
+        # results can not be cached yet under a table key that this process has just created, supersets neither
+        known_miss = fresh_generations.is_miss(self._cache_table_keys, key)
+        if not known_miss:
+            entry = self._get_cached_entry(key)
+        if entry is not None:
+            self._refresh_ahead(key, entry)
+            result_set = entry.result_set
+        if result_set is None and not known_miss:
+            result_set = self._get_from_superset()
+        if hooks.active:
+            hooks.after('cache_get', queryset=self, key=key)
+        if measurement:
+            measurement.lap('cache_get')
         if result_set is None:
-            logger.debug('cache miss for key {0}'.format(key))
+            logger.debug('cache miss for key %s', key)
+            if hooks.active:
+                hooks.before('db', queryset=self, key=key)
+            started = time.time()
             result_set = list(super(CachingQuerySet, self).iterator())
-            self.cache_backend.set(key, result_set)
+            db_time = time.time() - started
+            if hooks.active:
+                hooks.after('db', queryset=self, key=key)
+                hooks.before('cache_set', queryset=self, key=key)
+            if measurement:
+                measurement.lap('db')
+            admitted = admission.admit(self, key, db_time)
+            if admitted and transaction_state is not None:
+                transaction_state.cache_on_commit(self.model._meta.db_table,
+                                                  functools.partial(self._set_cached_entry, key, result_set))
+            elif admitted:
+                self._set_cached_entry(key, result_set)
+                fresh_generations.populated(self._cache_table_keys, key)
+            if hooks.active:
+                hooks.after('cache_set', queryset=self, key=key)
+            if measurement:
+                measurement.lap('cache_set')
+                measurement.written(result_set)
+                measurement.finish('miss', key)
+        else:
+            if adaptive_bypass:
+                bypass_tracker.record_hit(self.model._meta.db_table)
+            if measurement:
+                measurement.read(result_set)
+                measurement.finish('hit', key)
         for result in result_set:
             yield result
 
+    def _get_cached_entry(self, key):
+        """
+        Get the cached result for key. Results cached as plain lists by earlier versions have no creation time.
+        Results cached in chunks are returned as a LazyResultSet.
+
+        Returns
+        ~~~~~~~
+        CachedResult or None
+        """
+        entry = None
+        host_cache = get_host_cache()
+        if host_cache is not None:
+            entry = host_cache.get(key)
+        if entry is None:
+            entry = breaker.call(self.cache_backend.get,
+                                 random_replica_key(key, self.get_cache_option('hot_replicas', 1)))
+            if entry is FAILED:
+                return None
+        if entry is None or isinstance(entry, CachedResult):
+            return entry
+        if isinstance(entry, EmptyResult):
+            return CachedResult(entry.created, [])
+        if isinstance(entry, ChunkedResult):
+            return CachedResult(entry.created, LazyResultSet(entry.chunks, entry.count, entry.chunk_size))
+        return CachedResult(None, entry)
+
+    def _set_cached_entry(self, key, result_set):
+        """
+        Cache result_set for key. Empty results are cached as EmptyResult tombstones, for negative_timeout
+        seconds when the option is set. With hot_replicas, results are cached under replica keys as well. With
+        dedup_related, related instances loaded by select_related are shared by the rows before caching, so that
+        each is serialized once.
+
+        Results read from a replica within replica_lag seconds of a write to their tables may be stale. They are
+        not cached, or cached for replica_lag_timeout seconds when the option is set.
+        """
+        timeout = None
+        if self._replica_lagging():
+            timeout = self.get_cache_option('replica_lag_timeout')
+            if not timeout:
+                logger.debug('not caching key %s read from lagging replica %s', key, self.db)
+                return
+        if not result_set:
+            negative_timeout = self.get_cache_option('negative_timeout')
+            if timeout is None or (negative_timeout is not None and negative_timeout < timeout):
+                timeout = negative_timeout
+            self._backend_set(key, EmptyResult(time.time()), timeout)
+            return
+        if self.query.select_related and self.get_cache_option('dedup_related', False):
+            _intern_related(result_set)
+        chunk_size = self.get_cache_option('lazy_chunk_size')
+        if chunk_size and len(result_set) > chunk_size:
+            entry = ChunkedResult(time.time(), len(result_set), chunk_size,
+                                  dump_chunks(result_set, chunk_size))
+        else:
+            entry = CachedResult(time.time(), result_set)
+        host_cache = get_host_cache()
+        # entries of the host tier have no timeout
+        if (timeout is None and host_cache is not None and
+                len(result_set) >= self.get_cache_option('host_cache_min_rows', 1000)):
+            if not host_cache.set(key, entry):
+                logger.debug('key %s is larger than a segment of the host cache, caching it in the backend', key)
+                self._backend_set(key, entry, timeout)
+        else:
+            self._backend_set(key, entry, timeout)
+
+    def _replica_lagging(self):
+        """
+        Whether results are read from a database in read_replicas within replica_lag seconds of the latest write
+        to the tables of the last generated key.
+        """
+        lag = self.get_cache_option('replica_lag')
+        if not lag or self._cache_updated is None or self.db not in conf.get_setting('read_replicas', {}):
+            return False
+        return time.time() - self._cache_updated < lag
+
+    def _backend_set(self, key, entry, timeout=None):
+        # the default timeout of the backend is used unless a timeout is given
+        args = () if timeout is None else (timeout,)
+        replicas = self.get_cache_option('hot_replicas', 1)
+        if replicas > 1:
+            breaker.call(self.cache_backend.set_many, dict((replica, entry) for replica in replica_keys(key, replicas)),
+                         *args)
+        else:
+            breaker.call(self.cache_backend.set, key, entry, *args)
+
+    def _refresh_ahead(self, key, entry):
+        """
+        Schedule a background refresh of an entry that has been read at least refresh_ahead_min_hits times by
+        this process and is within the last refresh_ahead fraction of the cache timeout.
+        """
+        fraction = self.get_cache_option('refresh_ahead')
+        timeout = getattr(self.cache_backend, 'default_timeout', None)
+        if not fraction or not timeout or entry.created is None:
+            return
+        hits = access_counter.increment(key)
+        if (hits >= self.get_cache_option('refresh_ahead_min_hits', 2) and
+                time.time() - entry.created >= timeout * (1 - fraction)):
+            access_counter.reset(key)
+            refresher.schedule(key, functools.partial(self._clone()._refresh, key), self.db)
+
+    def _refresh(self, key):
+        """
+        Evaluate the query and replace the cached result for key, unless the model cache was invalidated
+        in the meantime.
+        """
+        if self.generate_key() != key:
+            return
+        logger.debug('refreshing key %s', key)
+        self._set_cached_entry(key, list(super(CachingQuerySet, self).iterator()))
+
+    def _get_from_superset(self):
+        """
+        Serve a sliced or projected (only/defer) query from the cached result of the same query without limits
+        and with all fields, when that result has at most superset_max_rows rows. Projected queries then
+        return instances with all fields loaded.
+
+        Returns
+        ~~~~~~~
+        List of results or None
+        """
+        max_rows = self.get_cache_option('superset_max_rows')
+        if max_rows is None or getattr(self, '_iterable_class', ModelIterable) is not ModelIterable:
+            return None
+        query = self.query
+        deferred_fields, defer = query.deferred_loading
+        sliced = query.low_mark != 0 or query.high_mark is not None
+        if not sliced and not deferred_fields and defer:
+            return None
+        superset = self._clone()
+        superset.query.clear_limits()
+        superset.query.clear_deferred_loading()
+        entry = superset._get_cached_entry(superset.generate_key())
+        if entry is None or len(entry.result_set) > max_rows:
+            return None
+        logger.debug('serving query from cached superset for model %s', self.model._meta.db_table)
+        return entry.result_set[query.low_mark:query.high_mark]
+
+    def _fetch_all(self):
+        if (self._result_cache is None and self._prefetch_related_lookups and
+                self.get_cache_option('cache_prefetch', False)):
+            self._fetch_prefetched_graph()
+        super(CachingQuerySet, self)._fetch_all()
+
+    def _fetch_prefetched_graph(self):
+        """
+        Load results together with their prefetched related objects as a single cache entry. Query sets
+        whose object graph can not be resolved are left to the default prefetch behavior.
+        """
+        if (self.get_cache_option('adaptive_bypass', False) and
+                bypass_tracker.is_bypassed(self.model._meta.db_table)):
+            return
+        # object graphs span tables that may be written by the transaction
+        if self.get_cache_option('transaction_aware', False) and transactions.get_state(self.db) is not None:
+            return
+        try:
+            key = self.generate_prefetch_key()
+        except EmptyResultSet:
+            return
+        if key is None:
+            return
+        entry = self._get_cached_entry(key)
+        if entry is None:
+            logger.debug('cache miss for prefetch key %s', key)
+            updated = self._cache_updated
+            self._result_cache = list(self.iterator())
+            self._prefetch_related_objects()
+            # the write time of the whole object graph, not of the model table alone
+            self._cache_updated = updated
+            self._set_cached_entry(key, self._result_cache)
+        else:
+            self._result_cache = list(entry.result_set)
+            self._prefetch_done = True
+
+    def _clone(self, *args, **kwargs):
+        clone = super(CachingQuerySet, self)._clone(*args, **kwargs)
+        clone._cache_options = self._cache_options
+        return clone
+
+    def __getstate__(self):
+        # cache backends hold connections and locks that can not be pickled
+        obj_dict = super(CachingQuerySet, self).__getstate__()
+        obj_dict.pop('_cache_backend', None)
+        obj_dict.pop('_cache_backend_alias', None)
+        return obj_dict
+
     def bulk_create(self, *args, **kwargs):
         self.invalidate_model_cache()
         return super(CachingQuerySet, self).bulk_create(*args, **kwargs)
@@ -61,3 +361,25 @@ class CachingQuerySet(CacheBackendMixin, CacheKeyMixin, CacheInvalidateMixin, Qu
     def update(self, **kwargs):
         self.invalidate_model_cache()
         return super(CachingQuerySet, self).update(**kwargs)
+
+
+def _intern_related(result_set):
+    """
+    Replace the related instances cached on the rows of result_set by select_related, at any depth, with a single
+    instance for each model and primary key.
+    """
+    interned = {}
+    pending = [instance for instance in result_set if isinstance(instance, models.Model)]
+    while pending:
+        instance = pending.pop()
+        for name, value in list(instance.__dict__.items()):
+            # django caches related instances in attributes named _<field>_cache
+            if not isinstance(value, models.Model) or not name.endswith('_cache'):
+                continue
+            identity = (type(value), value.pk)
+            shared = interned.get(identity)
+            if shared is None:
+                interned[identity] = value
+                pending.append(value)
+            elif shared is not value:
+                instance.__dict__[name] = shared
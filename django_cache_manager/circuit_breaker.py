@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Circuit breaker around calls to the cache backend, so that a slow or failing cache does not slow down queries.
+
+When circuit_breaker is enabled, calls that raise or take longer than circuit_breaker_latency milliseconds are
+failures. After circuit_breaker_failures consecutive failures the circuit opens: cache reads are misses, results
+are not stored and queries are served from the database. After circuit_breaker_reset seconds a single call is let
+through as a probe, and the circuit closes when it succeeds.
+
+Django cache backends can not be interrupted, so a call is only known to be slow once it returns; set the socket
+timeouts of the backend as well.
+
+Invalidations that could not be shared while the circuit was open are shared again when it closes, so that
+results cached before the failure are not served after recovery.
+
+    DJANGO_CACHE_MANAGER = {
+        'circuit_breaker': True,
+        'circuit_breaker_failures': 5,
+        'circuit_breaker_latency': 50,
+        'circuit_breaker_reset': 30,
+    }
+"""
+import logging
+import threading
+import time
+
+from . import conf
+
+
+logger = logging.getLogger(__name__)
+
+# Returned by CircuitBreaker.call when the call failed or was skipped
+FAILED = object()
+
+
+class CircuitBreaker(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recovery_callbacks = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self._probing = False
+
+    @property
+    def is_open(self):
+        return self.opened is not None
+
+    def on_recovery(self, callback):
+        """
+        Register a callback called without arguments each time the circuit closes.
+        """
+        self._recovery_callbacks.append(callback)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func unless the circuit is open.
+
+        Returns
+        ~~~~~~~
+        Result of func, or FAILED if func raised, was too slow or was not called
+        """
+        if not conf.get_setting('circuit_breaker', False):
+            return func(*args, **kwargs)
+        if not self._allow():
+            return FAILED
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            logger.warning('cache backend call failed', exc_info=True)
+            self._failure()
+            return FAILED
+        if (time.time() - start) * 1000 > conf.get_setting('circuit_breaker_latency', 50):
+            self._failure()
+        else:
+            self._success()
+        return result
+
+    def _allow(self):
+        if self.opened is None:
+            return True
+        with self._lock:
+            if self._probing or time.time() - self.opened < conf.get_setting('circuit_breaker_reset', 30):
+                return False
+            self._probing = True
+            return True
+
+    def _failure(self):
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            if self.opened is not None:
+                self.opened = time.time()
+            elif self.failures >= conf.get_setting('circuit_breaker_failures', 5):
+                logger.warning('cache backend circuit opened after %s failures', self.failures)
+                self.opened = time.time()
+
+    def _success(self):
+        with self._lock:
+            recovered = self.opened is not None
+            self.failures = 0
+            self.opened = None
+            self._probing = False
+        if recovered:
+            logger.warning('cache backend circuit closed')
+            for callback in self._recovery_callbacks:
+                callback()
+
+
+breaker = CircuitBreaker()
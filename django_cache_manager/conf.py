@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Options for django_cache_manager.
+
+Options are read from the DJANGO_CACHE_MANAGER dictionary in django settings each time they are needed so
+that they can be changed with override_settings. Options for a single model are defined in the 'models'
+dictionary keyed by '<app_label>.<ModelName>' and take precedence over global options.
+
+    DJANGO_CACHE_MANAGER = {
+        'cache_prefetch': True,
+        'models': {
+            'tests.Manufacturer': {
+                'cache_prefetch': False,
+            },
+        },
+    }
+"""
+import django
+from django.conf import settings
+
+
+SETTINGS_NAME = 'DJANGO_CACHE_MANAGER'
+
+
+def get_setting(name, default=None):
+    """
+    Get a global option.
+    """
+    return getattr(settings, SETTINGS_NAME, {}).get(name, default)
+
+
+def get_model_option(model, name, default=None):
+    """
+    Get an option for a model, falling back to the global option.
+
+    Parameters
+    ~~~~~~~~~~
+    model
+        Model class or instance
+    name
+        Name of the option
+    default
+        Value returned when the option is not defined
+    """
+    options = getattr(settings, SETTINGS_NAME, {})
+    model_label = u'{0}.{1}'.format(model._meta.app_label, model._meta.object_name)
+    model_options = options.get('models', {}).get(model_label, {})
+    if name in model_options:
+        return model_options[name]
+    return options.get(name, default)
+
+
+def get_table_option(table_name, name, default=None):
+    """
+    Get an option for the model of a table, falling back to the global option. Used where only the table name is
+    known, e.g. for table keys.
+    """
+    options = getattr(settings, SETTINGS_NAME, {})
+    for model_label, model_options in options.get('models', {}).items():
+        if name in model_options and get_model(model_label)._meta.db_table == table_name:
+            return model_options[name]
+    return options.get(name, default)
+
+
+def get_model(model_label):
+    """
+    Get a model class by its '<app_label>.<ModelName>' label.
+    """
+    app_label, model_name = model_label.split('.')
+    if django.VERSION < (1, 7):
+        from django.db.models import get_model
+        return get_model(app_label, model_name)
+    from django.apps import apps
+    return apps.get_model(app_label, model_name)
+
+
+def get_cache(alias):
+    """
+    Get the django cache backend of an alias.
+    """
+    import django.core.cache
+    if hasattr(django.core.cache, 'caches'):
+        return django.core.cache.caches[alias]
+    return django.core.cache.get_cache(alias)
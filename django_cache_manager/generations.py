@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tracking of fresh table keys, to skip cache reads that are known to miss.
+
+Right after a process creates a new key for a table, no result can be cached under it except by that process.
+With skip_fresh_misses set to a number of seconds, the process remembers the keys it creates and the queries it
+caches under them for that long, and serves other queries of those tables from the database without reading the
+cache. Results cached under a fresh key by other processes within that time are not read by this process.
+
+    DJANGO_CACHE_MANAGER = {
+        'skip_fresh_misses': 1,
+    }
+"""
+import threading
+import time
+
+from . import conf
+
+
+class FreshGenerations(object):
+    """
+    Table keys created by this process within skip_fresh_misses seconds, with the query keys cached under them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def created(self, table_key):
+        window = conf.get_setting('skip_fresh_misses')
+        if not window:
+            return
+        now = time.time()
+        with self._lock:
+            for expired in [generation for generation, (created, keys) in self._generations.items()
+                            if now - created >= window]:
+                del self._generations[expired]
+            self._generations[table_key] = (now, set())
+
+    def is_miss(self, table_keys, key):
+        """
+        Whether key can not be cached because one of the table keys it depends on is fresh and key was not
+        cached under it.
+        """
+        if not self._generations:
+            return False
+        window = conf.get_setting('skip_fresh_misses')
+        if not window:
+            return False
+        now = time.time()
+        with self._lock:
+            for table_key in table_keys:
+                created, keys = self._generations.get(table_key, (None, None))
+                if created is not None and now - created < window and key not in keys:
+                    return True
+        return False
+
+    def populated(self, table_keys, key):
+        if not self._generations:
+            return
+        with self._lock:
+            for table_key in table_keys:
+                if table_key in self._generations:
+                    self._generations[table_key][1].add(key)
+
+    def reset(self):
+        with self._lock:
+            self._generations = {}
+
+
+fresh_generations = FreshGenerations()
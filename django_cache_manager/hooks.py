@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Hook points around the steps of serving a query from the cache, to attach profilers or tracing spans.
+
+Each registered hook is called before and after every step with the name of the step and its context. Callers
+check active before building the context, so that hooks cost a single attribute lookup when none are registered.
+
+Steps
+~~~~~
+key_generation
+    CachingQuerySet.generate_key, context queryset. key is None after the step when the query returns nothing.
+cache_get
+    Reading and deserializing the cached result, context queryset and key. Deserialization happens in the
+    cache backend and is part of this step.
+db
+    Evaluating the query in the database on a miss, context queryset and key.
+cache_set
+    Serializing and writing the result to the cache, context queryset and key.
+invalidation
+    Generating a new key for a table, context table_name.
+share, retrieve
+    Sharing and retrieving the key of a table through the model cache sharing backend, context backend and key.
+
+    import cProfile
+    from django_cache_manager import hooks
+
+    class ProfileDatabase(hooks.Hook):
+        profile = cProfile.Profile()
+
+        def before(self, step, **context):
+            if step == 'db':
+                self.profile.enable()
+
+        def after(self, step, **context):
+            if step == 'db':
+                self.profile.disable()
+
+    hooks.register(ProfileDatabase())
+"""
+import threading
+
+
+STEPS = ('key_generation', 'cache_get', 'db', 'cache_set', 'invalidation', 'share', 'retrieve')
+
+# True when at least one hook is registered
+active = False
+_hooks = ()
+_lock = threading.Lock()
+
+
+class Hook(object):
+    """
+    Base class of hooks, both methods do nothing.
+    """
+
+    def before(self, step, **context):
+        pass
+
+    def after(self, step, **context):
+        pass
+
+
+def register(hook):
+    global active, _hooks
+    with _lock:
+        _hooks = _hooks + (hook,)
+        active = True
+
+
+def unregister(hook):
+    global active, _hooks
+    with _lock:
+        _hooks = tuple(registered for registered in _hooks if registered is not hook)
+        active = bool(_hooks)
+
+
+def before(step, **context):
+    for hook in _hooks:
+        hook.before(step, **context)
+
+
+def after(step, **context):
+    for hook in _hooks:
+        hook.after(step, **context)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Host-local tier for large result sets, shared by all processes on a host through memory-mapped files.
+
+Results of at least host_cache_min_rows rows are stored in this tier instead of the cache backend. Reads of any
+query check this tier before the cache backend.
+
+The tier is a log of host_cache_segments segment files of equal size, host_cache_size bytes in total, and an index
+file of host_cache_slots slots mapping keys to the position of their serialized result. Results are appended to the
+current segment; when it is full the oldest segment is reused and its entries are dropped. Entries read from the
+older half of the segments are appended again, so that eviction approximates least recently used. Results are
+deserialized directly from the mapped segment. Processes synchronize with file locks, so the tier is only available
+on platforms with fcntl.
+
+    DJANGO_CACHE_MANAGER = {
+        'host_cache_dir': '/dev/shm/django_cache_manager',
+        'host_cache_size': 256 * 1024 * 1024,
+        'host_cache_min_rows': 1000,
+    }
+"""
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.core.exceptions import ImproperlyConfigured
+
+from . import conf
+
+
+_MAGIC = b'DCMH'
+# magic, number of slots, number of segments, current segment, offset in current segment
+_HEADER = struct.Struct('<4sIIIQ')
+# key, segment, epoch of the segment when the entry was written, offset, length
+_SLOT = struct.Struct('<32sIIQI')
+_EPOCH = struct.Struct('<I')
+# slots probed for a key, starting at the slot of its hash
+_MAX_PROBES = 8
+_EMPTY_KEY = b'\0' * 32
+
+
+class HostCache(object):
+    """
+    Segment files and index in directory. Opened again after a fork.
+    """
+
+    def __init__(self, directory, size, segments, slots):
+        self.directory = directory
+        self.size = size
+        self.segments = segments
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def get(self, key):
+        """
+        Returns
+        ~~~~~~~
+        Cached value or None
+        """
+        encoded = key.encode('ascii')
+        with self._lock:
+            self._open()
+            fcntl.flock(self._index_file, fcntl.LOCK_SH)
+            try:
+                position = self._find(encoded)
+                if position is None:
+                    return None
+                segment, offset, length = position
+                value = _loads(self._segments[segment], offset, length)
+                promote = (self._segment_count > 1 and
+                           (self._current - segment) % self._segment_count >= self._segment_count // 2)
+                data = self._segments[segment][offset:offset + length] if promote else None
+            finally:
+                fcntl.flock(self._index_file, fcntl.LOCK_UN)
+            if promote:
+                self._append(encoded, data)
+        return value
+
+    def set(self, key, value):
+        """
+        Returns
+        ~~~~~~~
+        Whether the value was stored, values larger than a segment are not
+        """
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._open()
+            return self._append(key.encode('ascii'), data)
+
+    def _append(self, key, data):
+        if len(data) > self._segment_size:
+            return False
+        fcntl.flock(self._index_file, fcntl.LOCK_EX)
+        try:
+            magic, slots, segment_count, current, offset = _HEADER.unpack_from(self._index, 0)
+            if offset + len(data) > self._segment_size:
+                current = (current + 1) % segment_count
+                offset = 0
+                epoch_position = _HEADER.size + current * _EPOCH.size
+                _EPOCH.pack_into(self._index, epoch_position,
+                                 _EPOCH.unpack_from(self._index, epoch_position)[0] + 1)
+            self._segments[current][offset:offset + len(data)] = data
+            self._store_slot(key, current, offset, len(data))
+            _HEADER.pack_into(self._index, 0, magic, slots, segment_count, current, offset + len(data))
+        finally:
+            fcntl.flock(self._index_file, fcntl.LOCK_UN)
+        return True
+
+    @property
+    def _current(self):
+        return _HEADER.unpack_from(self._index, 0)[3]
+
+    def _epoch(self, segment):
+        return _EPOCH.unpack_from(self._index, _HEADER.size + segment * _EPOCH.size)[0]
+
+    def _slot_positions(self, key):
+        first = zlib.crc32(key) & 0xffffffff
+        for probe in range(min(_MAX_PROBES, self._slot_count)):
+            yield self._slots_start + ((first + probe) % self._slot_count) * _SLOT.size
+
+    def _find(self, key):
+        for position in self._slot_positions(key):
+            slot_key, segment, epoch, offset, length = _SLOT.unpack_from(self._index, position)
+            if slot_key == key:
+                if epoch != self._epoch(segment):
+                    return None
+                return segment, offset, length
+            if slot_key == _EMPTY_KEY:
+                return None
+        return None
+
+    def _store_slot(self, key, segment, offset, length):
+        target = None
+        for position in self._slot_positions(key):
+            slot_key, slot_segment, slot_epoch = _SLOT.unpack_from(self._index, position)[:3]
+            if slot_key == key or slot_key == _EMPTY_KEY:
+                target = position
+                break
+            if target is None and slot_epoch != self._epoch(slot_segment):
+                target = position
+        if target is None:
+            target = next(self._slot_positions(key))
+        _SLOT.pack_into(self._index, target, key, segment, self._epoch(segment), offset, length)
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        if fcntl is None:
+            raise ImproperlyConfigured('host_cache_dir requires fcntl')
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # created by another process
+                pass
+        index_file = open(os.path.join(self.directory, 'index'), 'a+b')
+        fcntl.flock(index_file, fcntl.LOCK_EX)
+        try:
+            if os.fstat(index_file.fileno()).st_size == 0:
+                index_size = _HEADER.size + self.segments * _EPOCH.size + self.slots * _SLOT.size
+                index_file.truncate(index_size)
+                index = mmap.mmap(index_file.fileno(), index_size)
+                _HEADER.pack_into(index, 0, _MAGIC, self.slots, self.segments, 0, 0)
+            else:
+                index = mmap.mmap(index_file.fileno(), os.fstat(index_file.fileno()).st_size)
+            # the layout of an existing tier is kept when options change
+            magic, self._slot_count, self._segment_count = _HEADER.unpack_from(index, 0)[:3]
+            if magic != _MAGIC:
+                raise ImproperlyConfigured('{0} is not a host cache directory'.format(self.directory))
+            self._segments = [self._open_segment(segment) for segment in range(self._segment_count)]
+        finally:
+            fcntl.flock(index_file, fcntl.LOCK_UN)
+        self._segment_size = len(self._segments[0])
+        self._slots_start = _HEADER.size + self._segment_count * _EPOCH.size
+        self._index_file = index_file
+        self._index = index
+        self._pid = os.getpid()
+
+    def _open_segment(self, segment):
+        with open(os.path.join(self.directory, 'segment_{0}'.format(segment)), 'a+b') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                f.truncate(self.size // self._segment_count)
+            return mmap.mmap(f.fileno(), os.fstat(f.fileno()).st_size)
+
+
+def _loads(segment, offset, length):
+    try:
+        view = memoryview(segment)
+    except TypeError:
+        # python 2 can not take a memoryview of a mmap
+        return pickle.loads(segment[offset:offset + length])
+    try:
+        return pickle.loads(view[offset:offset + length])
+    finally:
+        view.release()
+
+
+_host_caches = {}
+_host_caches_lock = threading.Lock()
+
+
+def get_host_cache():
+    """
+    The host tier of host_cache_dir.
+
+    Returns
+    ~~~~~~~
+    HostCache or None if host_cache_dir is not set
+    """
+    directory = conf.get_setting('host_cache_dir')
+    if not directory:
+        return None
+    host_cache = _host_caches.get(directory)
+    if host_cache is None:
+        with _host_caches_lock:
+            host_cache = _host_caches.setdefault(directory, HostCache(
+                directory,
+                conf.get_setting('host_cache_size', 256 * 1024 * 1024),
+                conf.get_setting('host_cache_segments', 8),
+                conf.get_setting('host_cache_slots', 65536),
+            ))
+    return host_cache
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy deserialization of large cached results.
+
+With lazy_chunk_size set, results of more than that many rows are cached as chunks of lazy_chunk_size rows that are
+serialized separately. On a hit only the chunk list is deserialized with the entry, and each chunk is deserialized
+when iteration or a slice reaches it, so that evaluations that stop early, e.g. loops over queryset.iterator() that
+break, and slices served from a cached superset only pay for the rows they use.
+
+    DJANGO_CACHE_MANAGER = {
+        'lazy_chunk_size': 100,
+    }
+"""
+import pickle
+
+
+def dump_chunks(result_set, chunk_size):
+    """
+    Serialize result_set in chunks of chunk_size rows.
+
+    Returns
+    ~~~~~~~
+    List of serialized chunks
+    """
+    return [pickle.dumps(result_set[start:start + chunk_size], pickle.HIGHEST_PROTOCOL)
+            for start in range(0, len(result_set), chunk_size)]
+
+
+class LazyResultSet(object):
+    """
+    Sequence of the rows of serialized chunks of chunk_size rows, the last chunk holding the remaining rows.
+    Chunks are deserialized once, when they are first read.
+    """
+
+    def __init__(self, chunks, count, chunk_size):
+        self.count = count
+        self._chunks = chunks
+        self._loaded = [None] * len(chunks)
+        self._chunk_size = chunk_size
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(len(self._chunks)):
+            for row in self._chunk(index):
+                yield row
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self.count
+            if not 0 <= index < self.count:
+                raise IndexError('result index out of range')
+            return self._chunk(index // self._chunk_size)[index % self._chunk_size]
+        start, stop, step = index.indices(self.count)
+        if step != 1:
+            return list(self)[index]
+        rows = []
+        for chunk_index in range(start // self._chunk_size, -(-stop // self._chunk_size)):
+            chunk_start = chunk_index * self._chunk_size
+            rows.extend(self._chunk(chunk_index)[max(start - chunk_start, 0):stop - chunk_start])
+        return rows
+
+    def _chunk(self, index):
+        rows = self._loaded[index]
+        if rows is None:
+            rows = self._loaded[index] = pickle.loads(self._chunks[index])
+        return rows
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from django_cache_manager import conf
+from django_cache_manager.metrics import generate_latest
+
+
+class Command(BaseCommand):
+    help = 'Print metrics of all processes on the host in Prometheus text exposition format.'
+
+    # django < 1.8 parses options with optparse and does not call add_arguments
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + (
+            make_option('--metrics-dir', default=None,
+                        help='Directory of metrics files, defaults to the metrics_dir option.'),
+        )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics-dir', default=None,
+                            help='Directory of metrics files, defaults to the metrics_dir option.')
+
+    def handle(self, *args, **options):
+        directory = options['metrics_dir'] or conf.get_setting('metrics_dir')
+        if not directory:
+            raise CommandError('No directory given and metrics_dir option is not set.')
+        self.stdout.write(generate_latest(directory), ending='')
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from django_cache_manager import conf
+from django_cache_manager.warmup import (
+    RateLimiter,
+    load_manifest,
+    most_common,
+    warm,
+)
+
+
+logger = logging.getLogger(__name__)
+_rate_limiter = None
+
+
+def _init_worker(rate):
+    global _rate_limiter
+    _rate_limiter = RateLimiter(rate)
+
+
+def _warm(entry):
+    _rate_limiter.wait()
+    try:
+        warm(entry)
+        return True
+    except Exception:
+        logger.exception('Failed to warm query for model %s', entry['model'])
+        return False
+
+
+class Command(BaseCommand):
+    help = 'Prefill the cache by replaying the most frequent queries recorded in the warmup manifest.'
+
+    # django < 1.8 parses options with optparse and does not call add_arguments
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + (
+            make_option('--manifest', default=None,
+                        help='Path of the manifest, defaults to the warmup_manifest option.'),
+            make_option('--limit', type='int', default=None,
+                        help='Replay only the given number of most frequent queries.'),
+            make_option('--workers', type='int', default=4,
+                        help='Number of workers replaying queries, 1 replays in the current thread.'),
+            make_option('--pool', type='choice', choices=['thread', 'process'], default='thread',
+                        help='Run workers in threads or in processes.'),
+            make_option('--rate', type='float', default=0,
+                        help='Maximum number of queries replayed per second, 0 for no limit.'),
+        )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manifest', default=None,
+                            help='Path of the manifest, defaults to the warmup_manifest option.')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Replay only the given number of most frequent queries.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of workers replaying queries, 1 replays in the current thread.')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run workers in threads or in processes.')
+        parser.add_argument('--rate', type=float, default=0,
+                            help='Maximum number of queries replayed per second, 0 for no limit.')
+
+    def handle(self, *args, **options):
+        manifest = options['manifest'] or conf.get_setting('warmup_manifest')
+        if not manifest:
+            raise CommandError('No manifest given and warmup_manifest option is not set.')
+        try:
+            entries = most_common(load_manifest(manifest), options['limit'])
+        except (IOError, OSError, ValueError) as e:
+            raise CommandError('Can not load manifest {0}: {1}'.format(manifest, e))
+
+        workers = max(options['workers'], 1)
+        if workers == 1:
+            _init_worker(options['rate'])
+            results = [_warm(entry) for entry in entries]
+        elif options['pool'] == 'process':
+            # each process limits its share of the rate
+            # forked workers must not share database connections with this process
+            connections.close_all()
+            pool = multiprocessing.Pool(workers, _init_worker, (options['rate'] / workers,))
+            results = pool.map(_warm, entries)
+            pool.close()
+        else:
+            # threads share a single rate limiter
+            _init_worker(options['rate'])
+            pool = ThreadPool(workers)
+            results = pool.map(_warm, entries)
+            pool.close()
+        self.stdout.write('Warmed {0} of {1} queries from {2}'.format(sum(results), len(entries), manifest))
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics of all processes on a host in Prometheus text exposition format.
+
+Each process adds the statistics of its evaluations and invalidations to its own memory-mapped file in
+metrics_dir. Metrics are aggregated by summing the files of all processes, so that the metrics view and the
+cache_metrics management command report the same values from any worker. Files of stopped processes are kept
+so that counters never decrease; clear metrics_dir when all workers are restarted.
+
+    DJANGO_CACHE_MANAGER = {
+        'metrics_dir': '/var/run/django_cache_manager_metrics',
+    }
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+
+from . import conf
+from .stats import (
+    BUCKETS,
+    TIMINGS,
+)
+
+
+PREFIX = 'django_cache_manager'
+# Metric name to type and help text
+METRICS = dict(
+    [('{0}_queries_total'.format(PREFIX), ('counter', 'Evaluations of CachingQuerySet by outcome.')),
+     ('{0}_bytes_read_total'.format(PREFIX), ('counter', 'Bytes of cached results read.')),
+     ('{0}_bytes_written_total'.format(PREFIX), ('counter', 'Bytes of results written to the cache.')),
+     ('{0}_invalidations_total'.format(PREFIX), ('counter', 'Invalidations of table caches.'))] +
+    [('{0}_{1}_milliseconds'.format(PREFIX, name), ('histogram', 'Duration of {0}.'.format(name)))
+     for name in TIMINGS]
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+_INITIAL_SIZE = 64 * 1024
+_HEADER_SIZE = 8
+
+
+class MmapedDict(object):
+    """
+    Dictionary of string keys to float values stored in a memory-mapped file. Written by a single process.
+
+    The file starts with the number of bytes used, followed by entries of key length, key padded to 8 bytes
+    and value. New entries are written before the number of bytes used is updated, so that readers never
+    see a partial entry.
+    """
+
+    def __init__(self, path):
+        self._f = open(path, 'a+b')
+        if os.fstat(self._f.fileno()).st_size == 0:
+            self._f.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._f.fileno()).st_size
+        self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._used = struct.unpack_from('<i', self._m, 0)[0] or _HEADER_SIZE
+        self._positions = dict((key, position) for key, value, position in _entries(self._m, self._used))
+
+    def increment(self, key, amount):
+        if key not in self._positions:
+            self._add(key)
+        position = self._positions[key]
+        value = struct.unpack_from('<d', self._m, position)[0]
+        struct.pack_into('<d', self._m, position, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode('utf-8')
+        padded_length = _padded_length(len(encoded))
+        entry = struct.pack('<i{0}sd'.format(padded_length), len(encoded), encoded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._f.truncate(self._capacity)
+            self._m.close()
+            self._m = mmap.mmap(self._f.fileno(), self._capacity)
+        self._m[self._used:self._used + len(entry)] = entry
+        self._positions[key] = self._used + 4 + padded_length
+        self._used += len(entry)
+        struct.pack_into('<i', self._m, 0, self._used)
+
+    def close(self):
+        self._m.close()
+        self._f.close()
+
+
+class ProcessMetrics(object):
+    """
+    Metrics file of the current process, reopened after a fork.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = None
+
+    def increment(self, directory, key, amount=1):
+        with self._lock:
+            if self._pid != os.getpid():
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._pid = os.getpid()
+                self._values = MmapedDict(os.path.join(directory, 'metrics_{0}.db'.format(self._pid)))
+            self._values.increment(key, amount)
+
+
+def metric_key(name, **labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def record_query(sender, outcome, timings, bytes_read, bytes_written, **kwargs):
+    """
+    Signal receiver for query_stats to add an evaluation to the metrics of this process.
+    """
+    directory = conf.get_setting('metrics_dir')
+    if not directory:
+        return
+    model_label = u'{0}.{1}'.format(sender._meta.app_label, sender._meta.object_name)
+    increment = process_metrics.increment
+    increment(directory, metric_key('{0}_queries_total'.format(PREFIX), model=model_label, outcome=outcome))
+    if bytes_read:
+        increment(directory, metric_key('{0}_bytes_read_total'.format(PREFIX), model=model_label), bytes_read)
+    if bytes_written:
+        increment(directory, metric_key('{0}_bytes_written_total'.format(PREFIX), model=model_label),
+                  bytes_written)
+    for name, duration in timings.items():
+        metric = '{0}_{1}_milliseconds'.format(PREFIX, name)
+        bound = next(bound for bound in BUCKETS if duration <= bound)
+        increment(directory, metric_key(metric + '_bucket', model=model_label, le=_format_value(bound)))
+        increment(directory, metric_key(metric + '_sum', model=model_label), duration)
+        increment(directory, metric_key(metric + '_count', model=model_label))
+
+
+def record_invalidation(table_name):
+    """
+    Add an invalidation of a table cache to the metrics of this process. Invalidations of related collections
+    are counted for the table holding the foreign key.
+    """
+    directory = conf.get_setting('metrics_dir')
+    if directory:
+        process_metrics.increment(directory, metric_key('{0}_invalidations_total'.format(PREFIX),
+                                                        table=table_name.split(':', 1)[0]))
+
+
+def collect(directory):
+    """
+    Sum the metrics of all processes.
+
+    Returns
+    ~~~~~~~
+    Dictionary of (name, labels) to value, labels being a tuple of sorted (label, value) pairs
+    """
+    values = {}
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER_SIZE:
+            continue
+        for key, value, position in _entries(data, struct.unpack_from('<i', data, 0)[0]):
+            name, labels = json.loads(key)
+            sample = (name, tuple(tuple(label) for label in labels))
+            values[sample] = values.get(sample, 0) + value
+    return values
+
+
+def generate_latest(directory):
+    """
+    Metrics of all processes in Prometheus text exposition format.
+    """
+    samples = {}
+    for (name, labels), value in collect(directory).items():
+        samples.setdefault(_metric_name(name), []).append((name, labels, value))
+    lines = []
+    for metric in sorted(samples):
+        metric_type, help_text = METRICS.get(metric, ('untyped', ''))
+        lines.append('# HELP {0} {1}'.format(metric, help_text))
+        lines.append('# TYPE {0} {1}'.format(metric, metric_type))
+        if metric_type == 'histogram':
+            metric_samples = _histogram_samples(samples[metric])
+        else:
+            metric_samples = sorted(samples[metric])
+        for name, labels, value in metric_samples:
+            lines.append(u'{0}{{{1}}} {2}'.format(name, u','.join(u'{0}="{1}"'.format(label, _escape(label_value))
+                                                                  for label, label_value in labels),
+                                                  _format_value(value)))
+    return u'\n'.join(lines) + u'\n'
+
+
+def _histogram_samples(samples):
+    """
+    Samples of a histogram grouped by labels, with cumulative bucket counts in order of their bounds
+    followed by sum and count.
+    """
+    histograms = {}
+    for name, labels, value in samples:
+        labels = dict(labels)
+        bound = labels.pop('le', None)
+        histogram = histograms.setdefault(tuple(sorted(labels.items())), {})
+        if bound is None:
+            histogram[name] = value
+        else:
+            histogram.setdefault('buckets', {})[float(bound)] = (name, value)
+    result = []
+    for labels in sorted(histograms):
+        histogram = histograms[labels]
+        buckets = histogram.pop('buckets', {})
+        total = 0
+        for bound in BUCKETS:
+            name, value = buckets.get(bound, (None, 0))
+            total += value
+            if name is not None or total:
+                bucket_name = name or next(iter(buckets.values()))[0]
+                result.append((bucket_name, tuple(sorted(labels + (('le', _format_value(bound)),))), total))
+        for name in sorted(histogram, key=lambda name: name.endswith('_count')):
+            result.append((name, labels, histogram[name]))
+    return result
+
+
+def _metric_name(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def _entries(data, used):
+    position = _HEADER_SIZE
+    while position < used:
+        length = struct.unpack_from('<i', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+        position += 4 + _padded_length(length)
+        yield key, struct.unpack_from('<d', data, position)[0], position
+        position += 8
+
+
+def _padded_length(length):
+    # key length and key are padded to a multiple of 8 bytes so that values are aligned
+    return length + (8 - (length + 4) % 8) % 8
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+process_metrics = ProcessMetrics()
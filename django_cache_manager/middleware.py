@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import logging
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    # django < 1.10 only supports MIDDLEWARE_CLASSES
+    MiddlewareMixin = object
+
+from . import tracing
+
+logger = logging.getLogger('django_cache_manager.tracing')
+
+
+class TraceMiddleware(MiddlewareMixin):
+    """
+    Traces the cached queries and invalidations of each request. The trace is reported in a Server-Timing header
+    and logged at info level with the trace as the cache_trace attribute of the log record.
+
+    Works in both MIDDLEWARE and MIDDLEWARE_CLASSES.
+    """
+
+    def process_request(self, request):
+        tracing.start()
+
+    def process_response(self, request, response):
+        trace = tracing.stop()
+        if trace is None:
+            return response
+        response['Server-Timing'] = trace.server_timing()
+        summary = trace.as_dict()
+        logger.info('%s %s: %s cached queries, %s misses, %s invalidations, %s repeated keys',
+                    request.method, request.path, summary['queries'], summary['misses'], summary['invalidations'],
+                    len(summary['repeated']), extra={'cache_trace': summary})
+        return response
@@ -1,48 +1,233 @@
 # -*- coding: utf-8 -*-
+import copy
 import hashlib
 import logging
 import uuid
 
 import django
-import django.core.cache
 
 from django.conf import settings
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.sql import EmptyResultSet
 from django.db.models.fields.related import RelatedField
+from django.db.models.sql.where import AND, OR
 
+from . import conf
+from .circuit_breaker import breaker
+from .generations import fresh_generations
 from .model_cache_sharing.types import ModelCacheInfo
 from .model_cache_sharing import model_cache_backend
-from .models import update_model_cache
+from .schema import model_fingerprint
+from .models import (
+    _listing_foreign_keys,
+    collection_cache_name,
+    sharing_options,
+    update_model_cache,
+    update_related_collections_cache,
+)
 
 
 _cache_name = getattr(settings, 'django_cache_manager.cache_backend', 'django_cache_manager.cache_backend')
 logger = logging.getLogger(__name__)
 
 
-class CacheKeyMixin(object):
+class CacheOptionsMixin(object):
+
+    _cache_options = {}
+
+    def get_cache_option(self, name, default=None):
+        """
+        Get an option for this query set, falling back to model and global options.
+        """
+        if name in self._cache_options:
+            return self._cache_options[name]
+        return conf.get_model_option(self.model, name, default)
+
+
+class CacheKeyMixin(CacheOptionsMixin):
+
+    # table keys of the last generated key
+    _cache_table_keys = ()
+    # time of the latest write to the tables of the last generated key, if known
+    _cache_updated = None
 
     def generate_key(self):
         """
         Generate cache key for the current query. If a new key is created for the model it is
         then shared with other consumers.
+
+        With the cache_related_collections option, queries that read the rows related to a single parent
+        are keyed by the foreign key and the parent instead of the model. With the canonical_keys option the
+        query is keyed by its canonical sql.
         """
-        sql = self.sql()
-        key, created = self.get_or_create_model_key()
-        if created:
-            db_table = self.model._meta.db_table
-            logger.debug('created new key {0} for model {1}'.format(key, db_table))
-            model_cache_info = ModelCacheInfo(db_table, key)
-            model_cache_backend.share_model_cache_info(model_cache_info)
-        query_key = u'{model_key}{qs}{db}'.format(model_key=key,
-                                                  qs=sql,
-                                                  db=self.db)
+        self._cache_updated = None
+        if self.get_cache_option('canonical_keys', False):
+            sql = self.canonical_sql()
+        else:
+            sql = self.sql()
+        self._cache_sql = sql
+        collection = None
+        if self.get_cache_option('cache_related_collections', False):
+            collection = self.related_collection()
+        if collection is None:
+            table_keys = (self.get_shared_table_key(self.model._meta.db_table),)
+        else:
+            field, value = collection
+            table_keys = (self.get_shared_table_key(collection_cache_name(field)),
+                          self.get_shared_table_key(collection_cache_name(field, value)))
+        self._cache_table_keys = table_keys
+        model_key = u''.join(u'{0}'.format(table_key) for table_key in table_keys)
+        query_key = u'{schema}{model_key}{qs}{db}'.format(schema=self.schema_fingerprint(),
+                                                          model_key=model_key,
+                                                          qs=sql,
+                                                          db=self.cache_database())
         key = hashlib.md5(query_key.encode('utf-8')).hexdigest()
         return key
 
+    def generate_prefetch_key(self):
+        """
+        Generate cache key for the current query together with its prefetch_related lookups. The key
+        changes when any of the tables in the prefetched object graph is invalidated.
+
+        Returns
+        ~~~~~~~
+        Cache key or None if the tables of the object graph can not be determined.
+
+        """
+        db_tables = self.prefetch_tables()
+        if db_tables is None:
+            return None
+        self._cache_updated = None
+        table_keys = [self.get_shared_table_key(db_table) for db_table in sorted(db_tables)]
+        lookups = [_lookup_key(lookup, self.db) for lookup in self._prefetch_related_lookups]
+        schema = self.schema_fingerprint(self.prefetch_models())
+        query_key = u'{schema}{table_keys}{qs}{lookups}{db}'.format(schema=schema,
+                                                                    table_keys=u''.join(table_keys),
+                                                                    qs=self.sql(),
+                                                                    lookups=u''.join(lookups),
+                                                                    db=self.cache_database())
+        return hashlib.md5(query_key.encode('utf-8')).hexdigest()
+
+    def related_collection(self):
+        """
+        Get the foreign key and the parent value when the current query reads only the rows related to
+        a single parent, e.g. manufacturer.cars.all() or driver.cars.all(). The query may read the model
+        table alone or joined to the intermediate table that holds the foreign key. Joins to other tables,
+        e.g. the table of a foreign key of the model, are not collections, as the rows of the model can move
+        to another parent without changing the joined table.
+
+        Returns
+        ~~~~~~~
+        (foreign_key, value) tuple or None
+
+        """
+        query = self.query
+        if (django.VERSION < (1, 8) or self.model._meta.parents or query.select_related or query.extra or
+                query.where.negated or query.where.connector != AND or _has_subquery(query.where)):
+            return None
+        aliases = [alias for alias, refcount in query.alias_refcount.items() if refcount]
+        tables = set([query.alias_map[alias].table_name for alias in aliases])
+        model_table = self.model._meta.db_table
+        # self joins and joins to other tables can change the result without touching the parent
+        if len(tables) != len(aliases) or len(tables) > 2 or model_table not in tables:
+            return None
+        for child in query.where.children:
+            lhs = getattr(child, 'lhs', None)
+            field = getattr(lhs, 'target', None)
+            if getattr(child, 'lookup_name', None) != 'exact' or not getattr(field, 'many_to_one', False):
+                continue
+            fk_table = query.alias_map[lhs.alias].table_name
+            if len(tables) == 1 and fk_table == model_table:
+                return field, child.rhs
+            if len(tables) == 2 and fk_table != model_table and field in _listing_foreign_keys(self.model):
+                return field, child.rhs
+        return None
+
+    def prefetch_tables(self):
+        """
+        Get the tables read when evaluating the current query and its prefetch_related lookups.
+
+        Returns
+        ~~~~~~~
+        Set of table names or None when a lookup can not be resolved to a model.
+
+        """
+        models = self.prefetch_models()
+        if models is None:
+            return None
+        db_tables = _query_tables(self.query, self.db)
+        db_tables |= set([model._meta.db_table for model in models])
+        for lookup in self._prefetch_related_lookups:
+            queryset = getattr(lookup, 'queryset', None)
+            if queryset is not None:
+                db_tables |= _query_tables(queryset.query, self.db)
+        return db_tables
+
+    def prefetch_models(self):
+        """
+        Get the models of the objects prefetched by the prefetch_related lookups of the current query, including
+        the models of select_related of lookup query sets.
+
+        Returns
+        ~~~~~~~
+        List of models or None when a lookup can not be resolved to a model.
+
+        """
+        if django.VERSION < (1, 8):
+            return None
+        models = []
+        for lookup in self._prefetch_related_lookups:
+            model = self.model
+            for name in getattr(lookup, 'prefetch_through', lookup).split(LOOKUP_SEP):
+                model = _related_model(model, name)
+                if model is None:
+                    return None
+                models.append(model)
+            queryset = getattr(lookup, 'queryset', None)
+            if queryset is not None:
+                models.extend(_select_related_models(queryset.model, queryset.query.select_related))
+        return models
+
     def sql(self):
         """
         Get sql for the current query.
         """
+        return _query_sql(self.query, self.db)
+
+    def schema_fingerprint(self, models=()):
+        """
+        Fingerprint of the fields of the model, of the models of select_related and of models, e.g. the prefetched
+        models, with the schema_keys option, otherwise an empty string.
+        """
+        if not self.get_cache_option('schema_keys', False):
+            return u''
+        fingerprints = []
+        for model in [self.model] + _select_related_models(self.model, self.query.select_related) + list(models):
+            fingerprint = model_fingerprint(model)
+            if fingerprint not in fingerprints:
+                fingerprints.append(fingerprint)
+        return u''.join(fingerprints)
+
+    def cache_database(self):
+        """
+        Database alias by which results are keyed. With share_replica_results, results read from a database in
+        read_replicas are keyed by its primary and shared with the primary and its other replicas.
+        """
+        if self.get_cache_option('share_replica_results', False):
+            return conf.get_setting('read_replicas', {}).get(self.db, self.db)
+        return self.db
+
+    def canonical_sql(self):
+        """
+        Get sql for the canonical form of the current query, in which conditions combined by the same
+        connector are flattened and sorted and the values of __in lookups are sorted. Equivalent queries
+        built in a different order, e.g. filter(a=1).filter(b=2) and filter(b=2, a=1), have the same
+        canonical sql.
+        """
+        if django.VERSION < (1, 8):
+            return self.sql()
         clone = self.query.clone()
+        clone.where = _canonical_where(clone.where, clone.get_compiler(using=self.db))
         sql, params = clone.get_compiler(using=self.db).as_sql()
         return sql % params
 
@@ -55,11 +240,147 @@ class CacheKeyMixin(object):
         (model_key, boolean) tuple
 
         """
-        model_cache_info = model_cache_backend.retrieve_model_cache_info(self.model._meta.db_table)
+        return self.get_or_create_table_key(self.model._meta.db_table)
+
+    def get_or_create_table_key(self, db_table):
+        """
+        Get or create key for a table.
+
+        Returns
+        ~~~~~~~
+        (table_key, boolean) tuple
+
+        """
+        model_cache_info = model_cache_backend.retrieve_model_cache_info(db_table, **sharing_options(db_table))
         if not model_cache_info:
             return uuid.uuid4().hex, True
+        # only needed to tell whether a replica may lag behind
+        if model_cache_info.updated is not None and self.get_cache_option('replica_lag'):
+            self._cache_updated = max(self._cache_updated or 0, model_cache_info.updated)
         return model_cache_info.table_key, False
 
+    def get_shared_table_key(self, db_table):
+        """
+        Get key for a table. A newly created key is shared with other consumers.
+        """
+        key, created = self.get_or_create_table_key(db_table)
+        # while the circuit is open the key is only used for this query, it must not replace the shared key
+        if created and not breaker.is_open:
+            logger.debug('created new key %s for model %s', key, db_table)
+            model_cache_backend.share_model_cache_info(ModelCacheInfo(db_table, key), **sharing_options(db_table))
+            fresh_generations.created(key)
+        return key
+
+
+def _query_sql(query, using):
+    clone = query.clone()
+    sql, params = clone.get_compiler(using=using).as_sql()
+    return sql % params
+
+
+def _query_tables(query, using):
+    """
+    Tables joined by a query. The query is compiled first so that joins added by the compiler,
+    such as those for select_related, are included.
+    """
+    clone = query.clone()
+    clone.get_compiler(using=using).as_sql()
+    return set([join.table_name for join in clone.alias_map.values()])
+
+
+def _canonical_where(node, compiler):
+    """
+    Copy of a where node with its children flattened and sorted by their sql.
+    """
+    children = []
+    for child in node.children:
+        if hasattr(child, 'children'):
+            child = _canonical_where(child, compiler)
+            if child.connector == node.connector and not child.negated:
+                children.extend(child.children)
+                continue
+        elif getattr(child, 'lookup_name', None) == 'in' and isinstance(child.rhs, (list, tuple, set)):
+            try:
+                rhs = sorted(child.rhs)
+            except TypeError:
+                rhs = child.rhs
+            child = copy.copy(child)
+            child.rhs = rhs
+        children.append(child)
+    if node.connector in (AND, OR):
+        children.sort(key=lambda child: _sort_key(child, compiler))
+    return node.__class__(children, node.connector, node.negated)
+
+
+def _sort_key(node, compiler):
+    try:
+        sql, params = compiler.compile(node)
+    except EmptyResultSet:
+        # a condition that matches nothing, e.g. pk__in=[], is left out of or negated by its parent
+        return u'', [u'EmptyResultSet']
+    return sql, [repr(param) for param in params]
+
+
+def _has_subquery(node):
+    """
+    Whether a where node reads other tables through subqueries or extra sql.
+    """
+    for child in node.children:
+        if hasattr(child, 'children'):
+            if _has_subquery(child):
+                return True
+        elif hasattr(child, 'sqls'):
+            return True
+        elif hasattr(getattr(child, 'rhs', None), 'as_sql') or hasattr(getattr(child, 'rhs', None), 'query'):
+            return True
+    return False
+
+
+def _lookup_key(lookup, using):
+    """
+    Key component for a prefetch_related lookup, either a string or a Prefetch object.
+    """
+    queryset = getattr(lookup, 'queryset', None)
+    if not hasattr(lookup, 'prefetch_through'):
+        return lookup
+    return u'{0}:{1}:{2}'.format(lookup.prefetch_through,
+                                 lookup.prefetch_to,
+                                 _query_sql(queryset.query, using) if queryset is not None else u'')
+
+
+def _select_related_models(model, select_related):
+    """
+    Models of the related objects named by select_related, a nested dict of field names. Models of
+    select_related() without field names are not known before the query is compiled, their columns are
+    part of the sql.
+    """
+    if django.VERSION < (1, 8) or not isinstance(select_related, dict):
+        return []
+    models = []
+    for name, nested in sorted(select_related.items()):
+        related_model = _related_model(model, name)
+        if related_model is not None:
+            models.append(related_model)
+            models.extend(_select_related_models(related_model, nested))
+    return models
+
+
+def _related_model(model, name):
+    """
+    Model reached from model through the attribute name used by prefetch_related. Reverse relations are
+    matched by accessor name. Returns None for unknown attributes and generic foreign keys.
+    """
+    for field in model._meta.get_fields():
+        if not field.is_relation or field.related_model is None:
+            continue
+        if field.auto_created and not field.concrete:
+            accessor_name = field.get_accessor_name()
+        else:
+            accessor_name = field.name
+        if accessor_name == name:
+            return field.related_model
+    return None
+
 
 class CacheInvalidateMixin(object):
 
@@ -67,7 +388,7 @@ class CacheInvalidateMixin(object):
         """
         Invalidate model cache by generating new key for the model.
         """
-        logger.info('Invalidating cache for table {0}'.format(self.model._meta.db_table))
+        logger.info('Invalidating cache for table %s', self.model._meta.db_table)
         if django.VERSION >= (1, 8):
             related_tables = set(
                 [f.related_model._meta.db_table for f in self.model._meta.get_fields()
@@ -78,28 +399,27 @@ class CacheInvalidateMixin(object):
             # temporary fix for m2m relations with an intermediate model, goes away after better join caching
             related_tables |= set([field.rel.to._meta.db_table for field in self.model._meta.fields if issubclass(type(field), RelatedField)])
 
-        logger.debug('Related tables of model {0} are {1}'.format(self.model, related_tables))
+        logger.debug('Related tables of model %s are %s', self.model, related_tables)
         update_model_cache(self.model._meta.db_table)
         for related_table in related_tables:
             update_model_cache(related_table)
+        update_related_collections_cache(self.model)
 
 
-class CacheBackendMixin(object):
+class CacheBackendMixin(CacheOptionsMixin):
 
     @property
     def cache_backend(self):
         """
-        Get the cache backend
+        Get the cache backend of the cache_alias option, django_cache_manager.cache_backend by default.
 
         Returns
         ~~~~~~~
         Django cache backend
 
         """
-        if not hasattr(self, '_cache_backend'):
-            if hasattr(django.core.cache, 'caches'):
-                self._cache_backend = django.core.cache.caches[_cache_name]
-            else:
-                self._cache_backend = django.core.cache.get_cache(_cache_name)
-
+        alias = self.get_cache_option('cache_alias', _cache_name)
+        if getattr(self, '_cache_backend_alias', None) != alias:
+            self._cache_backend = conf.get_cache(alias)
+            self._cache_backend_alias = alias
         return self._cache_backend
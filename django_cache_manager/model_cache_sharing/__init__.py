@@ -2,8 +2,26 @@
 
 """
 Module has backends for sharing model cache info with all django processes.
+
+The backend is a subclass of BaseSharing, SharedMemory by default, selected with the sharing_backend option:
+
+    DJANGO_CACHE_MANAGER = {
+        'sharing_backend': 'django_cache_manager.model_cache_sharing.backends.shared_memory.SharedMemory',
+    }
 """
+import importlib
+
+from .. import conf
+
+DEFAULT_BACKEND = 'django_cache_manager.model_cache_sharing.backends.shared_memory.SharedMemory'
+
+
+def load_backend(path):
+    """
+    Instantiate the sharing backend class at the dotted path.
+    """
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)()
 
-from .backends.shared_memory import SharedMemory
 
-model_cache_backend = SharedMemory()
+model_cache_backend = load_backend(conf.get_setting('sharing_backend', DEFAULT_BACKEND))
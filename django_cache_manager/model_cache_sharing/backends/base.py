@@ -19,6 +19,9 @@ class BaseSharing(object):
         ~~~~~~~~~~
         model_cache_info
             A named tuple of type django_cache_manager.model_cache_sharing.types.ModelCacheInfo
+        replicas
+            Keyword argument given for hot tables, number of copies to spread reads over. Backends that do not
+            replicate ignore it.
         """
 
     @abstractmethod
@@ -30,6 +33,8 @@ class BaseSharing(object):
         ~~~~~~~~~~
         key
             Key for a model, typically the table_name.
+        replicas
+            Keyword argument given for hot tables, number of copies the model cache info was shared with.
 
         Returns
         ~~~~~~~
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import logging
-import django
-import django.core.cache
+import threading
 
 from django.conf import settings
 
+from ... import conf, hooks
+from ...circuit_breaker import FAILED, breaker
+from ...replicas import random_replica_key, replica_keys
 from .base import BaseSharing
 
 _cache_name = getattr(settings, 'django_cache_manager.cache_backend', 'django_cache_manager.cache_backend')
@@ -14,21 +16,62 @@ logger = logging.getLogger(__name__)
 class SharedMemory(BaseSharing):
     "Processes implicitly communicate by using a shared memory "
 
+    def __init__(self):
+        # model cache info that could not be shared while the cache backend circuit was open, by table name
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        breaker.on_recovery(self.share_pending)
+
     # could use a different cache namespace
-    def share_model_cache_info(self, model_cache_info, **kwargs):
-        logger.info(u'Updating model cache {0}'.format(model_cache_info))
-        self.cache_backend.set(model_cache_info.table_name, model_cache_info)
+    def share_model_cache_info(self, model_cache_info, replicas=1, **kwargs):
+        """
+        With replicas, the info is written under that many keys, see django_cache_manager.replicas.
+        """
+        logger.info(u'Updating model cache %s', model_cache_info)
+        table_name = model_cache_info.table_name
+        if hooks.active:
+            hooks.before('share', backend=self, key=table_name)
+        if replicas > 1:
+            shared = breaker.call(self.cache_backend.set_many,
+                                  dict((key, model_cache_info) for key in replica_keys(table_name, replicas)))
+        else:
+            shared = breaker.call(self.cache_backend.set, table_name, model_cache_info)
+        if shared is FAILED:
+            with self._pending_lock:
+                self._pending[table_name] = (model_cache_info, replicas)
+        if hooks.active:
+            hooks.after('share', backend=self, key=table_name)
+
+    def retrieve_model_cache_info(self, key, replicas=1, **kwargs):
+        """
+        With replicas, the info is read from a random replica, or from key when the replica is missing.
+        """
+        if hooks.active:
+            hooks.before('retrieve', backend=self, key=key)
+        replica = random_replica_key(key, replicas)
+        model_cache_info = breaker.call(self.cache_backend.get, replica)
+        if model_cache_info is None and replica != key:
+            model_cache_info = breaker.call(self.cache_backend.get, key)
+        if hooks.active:
+            hooks.after('retrieve', backend=self, key=key)
+        return None if model_cache_info is FAILED else model_cache_info
 
-    def retrieve_model_cache_info(self, key, **kwargs):
-        model_cache_info = self.cache_backend.get(key)
-        return model_cache_info
+    def share_pending(self):
+        """
+        Share model cache info that could not be shared while the circuit was open.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for model_cache_info, replicas in pending.values():
+            self.share_model_cache_info(model_cache_info, replicas=replicas)
 
     @property
     def cache_backend(self):
-        if not hasattr(self, '_cache_backend'):
-            if hasattr(django.core.cache, 'caches'):
-                self._cache_backend = django.core.cache.caches[_cache_name]
-            else:
-                self._cache_backend = django.core.cache.get_cache(_cache_name)
-
+        """
+        Cache backend of the generation_cache_alias option, django_cache_manager.cache_backend by default.
+        """
+        alias = conf.get_setting('generation_cache_alias', _cache_name)
+        if not hasattr(self, '_cache_backend') or self._cache_backend_alias != alias:
+            self._cache_backend = conf.get_cache(alias)
+            self._cache_backend_alias = alias
         return self._cache_backend
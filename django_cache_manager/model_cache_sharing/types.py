@@ -3,5 +3,7 @@
 from collections import namedtuple
 
 
-# Type for cache metadata of a model. Conisits of table_name and table_key
-ModelCacheInfo = namedtuple('ModelCacheInfo', ['table_name', 'table_key'])
+# Type for cache metadata of a model. Conisits of table_name, table_key and the time of the write that created
+# the key, None for keys created on a cache miss and keys shared by earlier versions
+ModelCacheInfo = namedtuple('ModelCacheInfo', ['table_name', 'table_key', 'updated'])
+ModelCacheInfo.__new__.__defaults__ = (None,)
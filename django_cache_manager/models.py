@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
 import uuid
 
 import django
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.db.models.fields.related import RelatedField
 
+from . import conf, hooks, tracing, transactions
+from .bypass import tracker as bypass_tracker
+from .generations import fresh_generations
+from .metrics import (
+    record_invalidation,
+    record_query,
+)
 from .model_cache_sharing.types import ModelCacheInfo
 from .model_cache_sharing import model_cache_backend
+from .signals import query_stats
 
 """
 Signal receivers for django model post_save and post_delete. Used to evict a model cache when
@@ -22,8 +31,115 @@ def update_model_cache(table_name):
     """
     Updates model cache by generating a new key for the model
     """
-    model_cache_info = ModelCacheInfo(table_name, uuid.uuid4().hex)
-    model_cache_backend.share_model_cache_info(model_cache_info)
+    if hooks.active:
+        hooks.before('invalidation', table_name=table_name)
+    model_cache_info = ModelCacheInfo(table_name, uuid.uuid4().hex, time.time())
+    model_cache_backend.share_model_cache_info(model_cache_info, **sharing_options(table_name))
+    fresh_generations.created(model_cache_info.table_key)
+    if hooks.active:
+        hooks.after('invalidation', table_name=table_name)
+    record_invalidation(table_name)
+    tracing.record_invalidation(table_name)
+    bypass_tracker.record_write(table_name)
+    transactions.record_write(table_name)
+
+
+def sharing_options(table_name):
+    """
+    Keyword arguments for the sharing backend when sharing or retrieving the key of a table, replicas for tables
+    of models with the hot_replicas option.
+    """
+    replicas = conf.get_table_option(table_name, 'hot_replicas', 1)
+    return {'replicas': replicas} if replicas > 1 else {}
+
+
+def collection_cache_name(field, value=None):
+    """
+    Name under which the key of related collections is shared. Collections of a foreign key share one
+    key for all parents, used for changes that can not be attributed to a parent, and have one key for each
+    parent value.
+
+    Parameters
+    ~~~~~~~~~~
+    field
+        The foreign key whose value selects the collection
+    value
+        Value of the foreign key for a single parent
+    """
+    name = u'{0}:{1}'.format(field.model._meta.db_table, field.column)
+    if value is None:
+        return name
+    return u'{0}:{1}'.format(name, value)
+
+
+def related_collections_enabled():
+    """
+    Whether related collections are cached for any model.
+    """
+    if django.VERSION < (1, 8):
+        return False
+    if conf.get_setting('cache_related_collections', False):
+        return True
+    model_options = conf.get_setting('models', {}).values()
+    return any(options.get('cache_related_collections', False) for options in model_options)
+
+
+def update_related_collections_cache(model):
+    """
+    Updates related collection cache for all collections that list rows of the model. Used for bulk
+    changes where the affected parents are not known.
+    """
+    if not related_collections_enabled():
+        return
+    for field in _foreign_keys(model):
+        update_model_cache(collection_cache_name(field))
+    for field in _listing_foreign_keys(model):
+        update_model_cache(collection_cache_name(field))
+
+
+def _foreign_keys(model):
+    return [field for field in model._meta.concrete_fields if field.many_to_one]
+
+
+def _listing_foreign_keys(model):
+    """
+    Foreign keys of intermediate models that select collections of the model, e.g. the driver key of the
+    driver-car table for cars.
+    """
+    fields = []
+    for rel in model._meta.get_fields(include_hidden=True):
+        if rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one):
+            fields.extend([field for field in _foreign_keys(rel.related_model) if field is not rel.field])
+    return fields
+
+
+def snapshot_foreign_keys(sender, instance, **kwargs):
+    """
+    Signal receiver for post_init to remember foreign key values of an instance, so that the collection
+    of the previous parent is invalidated when the foreign key changes.
+    """
+    if not related_collections_enabled():
+        return
+    instance._cache_manager_foreign_keys = dict(
+        [(field.attname, instance.__dict__[field.attname]) for field in _foreign_keys(sender)
+         if field.attname in instance.__dict__])
+
+
+def invalidate_related_collections(sender, instance):
+    """
+    Invalidate collections of the parents of an instance and collections that list the instance through
+    intermediate tables.
+    """
+    if instance is None or not related_collections_enabled():
+        return
+    previous_values = getattr(instance, '_cache_manager_foreign_keys', {})
+    for field in _foreign_keys(sender):
+        values = set([previous_values.get(field.attname), getattr(instance, field.attname, None)])
+        for value in values - set([None]):
+            update_model_cache(collection_cache_name(field, value))
+    for field in _listing_foreign_keys(sender):
+        update_model_cache(collection_cache_name(field))
+    snapshot_foreign_keys(sender, instance)
 
 
 def invalidate_model_cache(sender, instance, **kwargs):
@@ -38,7 +154,7 @@ def invalidate_model_cache(sender, instance, **kwargs):
     instance
         The actual instance being saved.
     """
-    logger.debug('Received post_save/post_delete signal from sender {0}'.format(sender))
+    logger.debug('Received post_save/post_delete signal from sender %s', sender)
     if django.VERSION >= (1, 8):
         related_tables = set(
             [f.related_model._meta.db_table for f in sender._meta.get_fields()
@@ -49,10 +165,12 @@ def invalidate_model_cache(sender, instance, **kwargs):
         related_tables = set([rel.model._meta.db_table for rel in sender._meta.get_all_related_objects()])
         # temporary fix for m2m relations with an intermediate model, goes away after better join caching
         related_tables |= set([field.rel.to._meta.db_table for field in sender._meta.fields if issubclass(type(field), RelatedField)])
-    logger.debug('Related tables of sender {0} are {1}'.format(sender, related_tables))
+    logger.debug('Related tables of sender %s are %s', sender, related_tables)
     update_model_cache(sender._meta.db_table)
     for related_table in related_tables:
         update_model_cache(related_table)
+    invalidate_related_collections(sender, instance)
+
 
 def invalidate_m2m_cache(sender, instance, model, **kwargs):
     """
@@ -67,11 +185,23 @@ def invalidate_m2m_cache(sender, instance, model, **kwargs):
     model
         The class of the objects that are added to, removed from or cleared from the relation.
     """
-    logger.debug('Received m2m_changed signals from sender {0}'.format(sender))
+    logger.debug('Received m2m_changed signals from sender %s', sender)
     update_model_cache(instance._meta.db_table)
     update_model_cache(model._meta.db_table)
+    if kwargs.get('action') in ('post_add', 'post_remove', 'post_clear') and related_collections_enabled():
+        pk_set = kwargs.get('pk_set')
+        for field in _foreign_keys(sender):
+            if isinstance(instance, field.related_model):
+                update_model_cache(collection_cache_name(field, instance.pk))
+            if issubclass(model, field.related_model):
+                if pk_set is None:
+                    update_model_cache(collection_cache_name(field))
+                for pk in pk_set or ():
+                    update_model_cache(collection_cache_name(field, pk))
 
 
+post_init.connect(snapshot_foreign_keys)
 post_save.connect(invalidate_model_cache)
 post_delete.connect(invalidate_model_cache)
 m2m_changed.connect(invalidate_m2m_cache)
+query_stats.connect(record_query)
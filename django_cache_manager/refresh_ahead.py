@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Refresh-ahead of popular cache entries. When an entry that has been read often by this process is read within the
+last fraction of its timeout, the query is evaluated again in a background thread and the entry replaced, while the
+cached result is returned to the reader.
+
+    DJANGO_CACHE_MANAGER = {
+        'refresh_ahead': 0.1,
+        'refresh_ahead_min_hits': 10,
+    }
+"""
+import logging
+import threading
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class AccessCounter(object):
+    """
+    Counts reads of cache keys in this process. Counts are reset when max_keys keys are counted.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def increment(self, key):
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                self._counts.clear()
+            self._counts[key] = self._counts.get(key, 0) + 1
+            return self._counts[key]
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+class Refresher(object):
+    """
+    Runs refreshes in background threads, at most one at a time for each key.
+    """
+
+    def __init__(self):
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, key, refresh, using):
+        """
+        Schedule a refresh of key unless one is already running.
+
+        Parameters
+        ~~~~~~~~~~
+        key
+            Cache key to refresh
+        refresh
+            Callable that evaluates the query and replaces the cache entry
+        using
+            Database alias used by refresh
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._start(key, refresh, using)
+
+    def _start(self, key, refresh, using):
+        thread = threading.Thread(target=self._run, args=(key, refresh, using))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, key, refresh, using):
+        try:
+            refresh()
+        except Exception:
+            logger.exception('refresh-ahead failed for key %s', key)
+        finally:
+            # database connections are per thread and not closed by django outside of requests
+            connections[using].close()
+            self._done(key)
+
+    def _done(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+
+access_counter = AccessCounter()
+refresher = Refresher()
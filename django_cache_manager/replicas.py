@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Replicas of hot cache keys. With hot_replicas set for a model or a query set, cached results are written under
+the key and hot_replicas - 1 replica keys, and each read picks one of them at random, so that reads of the same
+query are spread over the nodes of the cache. With hot_replicas set for a model or globally, the key of its table
+is replicated the same way.
+
+    DJANGO_CACHE_MANAGER = {
+        'models': {
+            'myapp.SiteConfiguration': {
+                'hot_replicas': 4,
+            },
+        },
+    }
+"""
+import random
+
+
+def replica_key(key, replica):
+    """
+    Key of a replica, replica 0 being the key itself.
+    """
+    if replica == 0:
+        return key
+    return u'{0}:{1}'.format(key, replica)
+
+
+def replica_keys(key, replicas):
+    return [replica_key(key, replica) for replica in range(replicas)]
+
+
+def random_replica_key(key, replicas):
+    if replicas <= 1:
+        return key
+    return replica_key(key, random.randrange(replicas))
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Schema fingerprints of models, to namespace cache keys by the schema of the cached instances.
+
+The sql of a query, and so its key, changes when columns are added or removed, but not when the python side of a
+model changes, e.g. the class of a field, so results cached by an earlier version of a model would be read after a
+deploy. With schema_keys, keys include a fingerprint of the fields of the model and of the models of select_related,
+and keys of prefetched object graphs those of the prefetched models, so that after a deploy only models whose fields
+changed start cold. Entries of earlier schemas are no longer read and expire with their timeout, so the cache does
+not have to be flushed.
+
+    DJANGO_CACHE_MANAGER = {
+        'schema_keys': True,
+    }
+"""
+import hashlib
+import threading
+
+
+_fingerprints = {}
+_lock = threading.Lock()
+
+
+def model_fingerprint(model):
+    """
+    Fingerprint of the table and the fields of model, computed once for each model class.
+    """
+    fingerprint = _fingerprints.get(model)
+    if fingerprint is None:
+        opts = model._meta
+        description = [u'{0}.{1}:{2}'.format(opts.app_label, opts.object_name, opts.db_table)]
+        for field in list(opts.fields) + list(opts.many_to_many):
+            field_class = type(field)
+            description.append(u'{0}:{1}:{2}:{3}.{4}'.format(field.name, field.attname, field.column,
+                                                             field_class.__module__, field_class.__name__))
+        fingerprint = hashlib.md5(u','.join(description).encode('utf-8')).hexdigest()[:8]
+        with _lock:
+            _fingerprints[model] = fingerprint
+    return fingerprint
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Signals sent by django_cache_manager. Receivers of signals sent for every query should be cheap.
+"""
+from django.dispatch import Signal
+
+
+# Sent for every evaluation of a CachingQuerySet when the stats option is enabled. The sender is the model.
+# outcome is 'hit', 'miss', 'empty' or 'bypass', timings is a dictionary of durations in milliseconds of
+# key_generation, cache_get, db and cache_set.
+query_stats = Signal(providing_args=['outcome', 'key', 'sql', 'timings', 'bytes_read', 'bytes_written'])
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Statistics of CachingQuerySet evaluations for each model and each query, collected in this process when the
+stats option is enabled. Each evaluation is also sent as the query_stats signal.
+
+    DJANGO_CACHE_MANAGER = {
+        'stats': True,
+        # measure sizes of cached results by serializing them a second time
+        'stats_sizes': False,
+    }
+
+    from django_cache_manager import stats
+    stats.get_stats('myapp.MyModel')
+"""
+import pickle
+import threading
+import time
+
+from . import conf, tracing
+from .signals import query_stats
+
+
+# Upper bounds in milliseconds of histogram buckets
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+COUNTERS = ('hits', 'misses', 'empty', 'bypassed', 'bytes_read', 'bytes_written')
+# Counter incremented for each outcome of an evaluation
+OUTCOME_COUNTERS = {'hit': 'hits', 'miss': 'misses', 'empty': 'empty', 'bypass': 'bypassed'}
+TIMINGS = ('key_generation', 'cache_get', 'db', 'cache_set')
+# Maximum number of queries with statistics, statistics of further queries are not kept
+MAX_QUERIES = 1000
+
+
+class Histogram(object):
+    """
+    Histogram of durations in milliseconds with fixed buckets.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.bucket_counts = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': list(zip(BUCKETS, self.bucket_counts)),
+        }
+
+
+class Stats(object):
+    """
+    Counters and timing histograms of a model or a query.
+    """
+
+    def __init__(self):
+        self.counters = dict((name, 0) for name in COUNTERS)
+        self.timings = dict((name, Histogram()) for name in TIMINGS)
+
+    def add(self, outcome, timings, bytes_read, bytes_written):
+        self.counters[OUTCOME_COUNTERS[outcome]] += 1
+        self.counters['bytes_read'] += bytes_read
+        self.counters['bytes_written'] += bytes_written
+        for name, duration in timings.items():
+            self.timings[name].observe(duration)
+
+    def as_dict(self):
+        result = dict(self.counters)
+        for name, histogram in self.timings.items():
+            result[name] = histogram.as_dict()
+        return result
+
+
+class StatsRegistry(object):
+    """
+    Statistics of all models and queries in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._models = {}
+            self._queries = {}
+
+    def add(self, model_label, sql, outcome, timings, bytes_read=0, bytes_written=0):
+        with self._lock:
+            self._models.setdefault(model_label, Stats()).add(outcome, timings, bytes_read, bytes_written)
+            if sql is not None and (sql in self._queries or len(self._queries) < MAX_QUERIES):
+                self._queries.setdefault(sql, (model_label, Stats()))[1].add(outcome, timings, bytes_read,
+                                                                              bytes_written)
+
+    def get_stats(self, model_label=None):
+        with self._lock:
+            if model_label is not None:
+                return self._models[model_label].as_dict() if model_label in self._models else None
+            return dict((label, stats.as_dict()) for label, stats in self._models.items())
+
+    def get_query_stats(self, model_label=None):
+        with self._lock:
+            return dict((sql, stats.as_dict()) for sql, (label, stats) in self._queries.items()
+                        if model_label is None or label == model_label)
+
+
+class Measurement(object):
+    """
+    Timings of a single evaluation of a query set. Each call to lap records the time since the previous lap.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.model_label = u'{0}.{1}'.format(queryset.model._meta.app_label, queryset.model._meta.object_name)
+        self.measure_sizes = queryset.get_cache_option('stats_sizes', False)
+        self.timings = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._last = time.time()
+
+    def lap(self, name):
+        now = time.time()
+        self.timings[name] = self.timings.get(name, 0) + (now - self._last) * 1000
+        self._last = now
+
+    def read(self, result_set):
+        if self.measure_sizes:
+            self.bytes_read += _size(result_set)
+
+    def written(self, result_set):
+        if self.measure_sizes:
+            self.bytes_written += _size(result_set)
+
+    def finish(self, outcome, key=None):
+        """
+        Record the evaluation.
+
+        Parameters
+        ~~~~~~~~~~
+        outcome
+            'hit', 'miss', 'empty' for queries that are known to return nothing or 'bypass' for queries of
+            tables that are bypassed
+        key
+            Cache key of the query
+        """
+        sql = getattr(self.queryset, '_cache_sql', None)
+        trace = tracing.current()
+        if trace is not None:
+            trace.add_query(self.model_label, outcome, key, self.timings, self.bytes_read, self.bytes_written)
+        registry.add(self.model_label, sql, outcome, self.timings, self.bytes_read, self.bytes_written)
+        query_stats.send(sender=self.queryset.model, outcome=outcome, key=key, sql=sql, timings=self.timings,
+                         bytes_read=self.bytes_read, bytes_written=self.bytes_written)
+
+
+def measure(queryset):
+    """
+    Start measuring an evaluation of queryset.
+
+    Returns
+    ~~~~~~~
+    Measurement or None if neither the stats option nor metrics_dir is set and no trace is started
+
+    """
+    if (not queryset.get_cache_option('stats', False) and not conf.get_setting('metrics_dir') and
+            tracing.current() is None):
+        return None
+    return Measurement(queryset)
+
+
+def _size(result_set):
+    return len(pickle.dumps(result_set, pickle.HIGHEST_PROTOCOL))
+
+
+registry = StatsRegistry()
+get_stats = registry.get_stats
+get_query_stats = registry.get_query_stats
+reset = registry.reset
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Traces of the CachingQuerySet evaluations and cache invalidations made while handling a request.
+
+A trace is collected for the current thread between start and stop, usually by TraceMiddleware which reports
+it in a Server-Timing header and a log record of the django_cache_manager.tracing logger.
+
+    MIDDLEWARE = [
+        'django_cache_manager.middleware.TraceMiddleware',
+        ...
+    ]
+"""
+import threading
+import time
+
+
+_local = threading.local()
+
+
+class Trace(object):
+    """
+    Evaluations and invalidations of a single request.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.queries = []
+        self.invalidations = []
+
+    def add_query(self, model_label, outcome, key, timings, bytes_read, bytes_written):
+        self.queries.append({
+            'model': model_label,
+            'outcome': outcome,
+            'key': key,
+            'timings': dict(timings),
+            'bytes_read': bytes_read,
+            'bytes_written': bytes_written,
+        })
+
+    def add_invalidation(self, name):
+        self.invalidations.append(name)
+
+    def count(self, outcome):
+        return sum(1 for query in self.queries if query['outcome'] == outcome)
+
+    def timings(self):
+        """
+        Total duration in milliseconds of each step of all evaluations.
+        """
+        from .stats import TIMINGS
+        totals = dict((name, 0.0) for name in TIMINGS)
+        for query in self.queries:
+            for name, duration in query['timings'].items():
+                totals[name] += duration
+        return totals
+
+    def repeated(self):
+        """
+        Keys evaluated more than once in the trace, with the number of evaluations. Repeated hits of the same
+        key usually mean that a query is made in a loop.
+        """
+        counts = {}
+        for query in self.queries:
+            if query['key'] is not None:
+                counts[query['key']] = counts.get(query['key'], 0) + 1
+        return dict((key, count) for key, count in counts.items() if count > 1)
+
+    def as_dict(self):
+        return {
+            'duration': (time.time() - self.started) * 1000,
+            'queries': len(self.queries),
+            'hits': self.count('hit'),
+            'misses': self.count('miss'),
+            'empty': self.count('empty'),
+            'bypassed': self.count('bypass'),
+            'invalidations': len(self.invalidations),
+            'timings': self.timings(),
+            'repeated': self.repeated(),
+            'details': self.queries,
+            'invalidated': self.invalidations,
+        }
+
+    def server_timing(self):
+        """
+        Value of a Server-Timing header with the number of queries and the duration of each step.
+        """
+        from .stats import TIMINGS
+        timings = self.timings()
+        description = '{0} queries, {1} hits, {2} misses, {3} invalidations'.format(
+            len(self.queries), self.count('hit'), self.count('miss'), len(self.invalidations))
+        metrics = ['cache;desc="{0}";dur={1:.3f}'.format(description, sum(timings.values()))]
+        metrics.extend('cache_{0};dur={1:.3f}'.format(name, timings[name]) for name in TIMINGS)
+        return ', '.join(metrics)
+
+
+def start():
+    """
+    Start a new trace for the current thread, discarding any trace that was not stopped.
+    """
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop():
+    """
+    Stop the trace of the current thread.
+
+    Returns
+    ~~~~~~~
+    Trace or None if no trace was started
+    """
+    trace = current()
+    _local.trace = None
+    return trace
+
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+def record_invalidation(name):
+    trace = current()
+    if trace is not None:
+        trace.add_invalidation(name)
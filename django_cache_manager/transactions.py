@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Transaction aware caching. Inside atomic blocks, reads after a write must see the write, and rows read from the
+transaction must not be cached for other processes before they are committed.
+
+With transaction_aware set globally, for a model or a query set, while a connection is in an atomic block:
+
+* Queries of a table written by the transaction are served from the database, or from a cache local to the
+  transaction when the same query is repeated, and are counted as 'bypass' in stats.
+* Results of other queries that miss the cache are cached when the transaction commits, and dropped when it is
+  rolled back.
+* Tables written by the transaction are invalidated again when it commits, so that results read by other processes
+  before the commit are not served afterwards.
+
+Caching after commit and the cache local to the transaction require on_commit, Django >= 1.9, as the end of a
+transaction can not be told otherwise. On earlier versions that support atomic blocks, all queries in atomic blocks
+are served from the database, repeated queries as well. The option has no effect on Django 1.5.
+
+    DJANGO_CACHE_MANAGER = {
+        'transaction_aware': True,
+    }
+"""
+import logging
+import pickle
+
+from django.db import connections
+
+from . import conf
+
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionState(object):
+    """
+    Tables written and results read by the transaction of a connection.
+    """
+
+    def __init__(self, connection):
+        self.dirty = set()
+        self._local = {}
+        self._pending = []
+        # bound methods are created on each access, the registered one is kept to find it again
+        self._on_commit = self.committed
+        if hasattr(connection, 'on_commit'):
+            connection.on_commit(self._on_commit)
+            self.all_dirty = False
+        else:
+            self.all_dirty = True
+
+    def is_active(self, connection):
+        """
+        Whether the transaction of this state is still running. The commit hook of a state is removed when the
+        transaction or the savepoint in which it was created ends. Without commit hooks a state is only used for
+        a single query.
+        """
+        if self.all_dirty:
+            return False
+        return any(func is self._on_commit for sids, func in connection.run_on_commit)
+
+    def is_dirty(self, table_name):
+        return self.all_dirty or table_name in self.dirty
+
+    def get_local(self, key):
+        """
+        Result cached for key in the transaction, or None.
+        """
+        if self.all_dirty:
+            return None
+        data = self._local.get(key)
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def set_local(self, key, result_set):
+        if self.all_dirty:
+            return
+        # serialized as in the shared cache, so that query sets do not share instances
+        self._local[key] = pickle.dumps(result_set, pickle.HIGHEST_PROTOCOL)
+
+    def cache_on_commit(self, table_name, set_entry):
+        """
+        Call set_entry after the commit unless table_name is written by the transaction.
+        """
+        if not self.all_dirty:
+            self._pending.append((table_name, set_entry))
+
+    def committed(self):
+        # circular import
+        from .models import update_model_cache
+        logger.debug('transaction committed, invalidating tables %s', sorted(self.dirty))
+        for table_name in sorted(self.dirty):
+            update_model_cache(table_name)
+        for table_name, set_entry in self._pending:
+            if table_name not in self.dirty:
+                set_entry()
+
+
+def transaction_aware_enabled():
+    """
+    Whether transaction_aware is set globally or for any model.
+    """
+    if conf.get_setting('transaction_aware', False):
+        return True
+    model_options = conf.get_setting('models', {}).values()
+    return any(options.get('transaction_aware', False) for options in model_options)
+
+
+def get_state(using):
+    """
+    State of the transaction of the connection of alias using.
+
+    Returns
+    ~~~~~~~
+    TransactionState or None outside of atomic blocks
+    """
+    connection = connections[using]
+    if not getattr(connection, 'in_atomic_block', False):
+        return None
+    state = getattr(connection, '_cache_manager_transaction', None)
+    if state is None or not state.is_active(connection):
+        state = connection._cache_manager_transaction = TransactionState(connection)
+    return state
+
+
+def record_write(table_name):
+    """
+    Record a write to table_name in the transactions of all connections of this thread that are in atomic
+    blocks, as the connection of the write is not known.
+    """
+    if not transaction_aware_enabled():
+        return
+    for alias in connections:
+        state = get_state(alias)
+        if state is not None:
+            state.dirty.add(table_name)
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+
+# Type for a cached query result. Consists of creation time in seconds since the epoch and the list of results
+CachedResult = namedtuple('CachedResult', ['created', 'result_set'])
+# Type for a cached query result without rows. Consists of creation time in seconds since the epoch
+EmptyResult = namedtuple('EmptyResult', ['created'])
+# Type for a cached query result serialized in chunks. Consists of creation time in seconds since the epoch, the
+# number of results, the number of results in each chunk but the last and the list of serialized chunks
+ChunkedResult = namedtuple('ChunkedResult', ['created', 'count', 'chunk_size', 'chunks'])
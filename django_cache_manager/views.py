@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from django.http import Http404, HttpResponse
+
+from . import conf
+from .metrics import CONTENT_TYPE, generate_latest
+
+
+def metrics(request):
+    """
+    Metrics of all processes on the host in Prometheus text exposition format.
+    """
+    directory = conf.get_setting('metrics_dir')
+    if not directory:
+        raise Http404('metrics_dir option is not set')
+    return HttpResponse(generate_latest(directory), content_type=CONTENT_TYPE)
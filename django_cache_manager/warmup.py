@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Recording of frequently served queries and replaying them to warm the cache, e.g. after a deploy or a flush.
+
+Queries are sampled by CachingQuerySet.iterator when warmup_manifest is set and saved in the manifest, a json
+file merged by all processes. The warm_cache management command replays the most frequent queries of the manifest.
+
+Queries are saved as pickles signed with SECRET_KEY, and queries whose signature does not match are not loaded, so
+that a manifest written by others can not run code. The manifest should still be kept in a directory writable only
+by the application, as anyone who can write it can replace the queries that are replayed by ones recorded earlier.
+
+    DJANGO_CACHE_MANAGER = {
+        'warmup_manifest': '/var/lib/myapp/django_cache_manager_warmup.json',
+        'warmup_sample_rate': 0.01,
+    }
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+
+from django.core.signing import Signer
+
+from . import conf
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder(object):
+    """
+    Samples queries served by CachingQuerySet and saves them to the warmup manifest.
+
+    Options
+    ~~~~~~~
+    warmup_manifest
+        Path of the manifest. Queries are recorded only when it is set.
+    warmup_sample_rate
+        Fraction of served queries that are recorded, 0.01 by default.
+    warmup_save_interval
+        Number of recorded queries after which the recorded queries are saved, 100 by default.
+    warmup_max_queries
+        Maximum number of queries kept in the manifest, 1000 by default.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._recorded = 0
+
+    def record(self, queryset):
+        """
+        Record a query set that is being served. Failures are logged, they must not fail the query.
+        """
+        manifest = conf.get_setting('warmup_manifest')
+        if not manifest or random.random() >= conf.get_setting('warmup_sample_rate', 0.01):
+            return
+        try:
+            save = self._record(queryset)
+        except Exception:
+            logger.exception('Failed to record query of model %s for warmup', queryset.model._meta.db_table)
+            return
+        if save:
+            self.save(manifest)
+
+    def _record(self, queryset):
+        """
+        Returns
+        ~~~~~~~
+        Whether the recorded queries are due to be saved
+        """
+        model_label = u'{0}.{1}'.format(queryset.model._meta.app_label, queryset.model._meta.object_name)
+        query_key = u'{0}{1}{2}'.format(model_label, queryset.sql(), queryset.db)
+        digest = hashlib.md5(query_key.encode('utf-8')).hexdigest()
+        with self._lock:
+            if digest not in self._queries:
+                payload = pickle.dumps((queryset.query, queryset._cache_options), pickle.HIGHEST_PROTOCOL)
+                self._queries[digest] = {
+                    'model': model_label,
+                    'db': queryset.db,
+                    'query': _signer().sign(base64.b64encode(payload).decode('ascii')),
+                    'count': 0,
+                }
+            self._queries[digest]['count'] += 1
+            self._recorded += 1
+            return self._recorded >= conf.get_setting('warmup_save_interval', 100)
+
+    def save(self, path):
+        """
+        Merge the recorded queries into the manifest at path. When the manifest can not be written the failure is
+        logged and the queries are kept to be saved with the next ones.
+        """
+        with self._lock:
+            queries, self._queries, self._recorded = self._queries, {}, 0
+        if not queries:
+            return
+        try:
+            self._write(path, queries)
+        except Exception:
+            logger.exception('Failed to save recorded queries to %s', path)
+            with self._lock:
+                for digest, entry in queries.items():
+                    if digest in self._queries:
+                        self._queries[digest]['count'] += entry['count']
+                    else:
+                        self._queries[digest] = entry
+            return
+        logger.debug('saved %s recorded queries to %s', len(queries), path)
+
+    def _write(self, path, queries):
+        try:
+            manifest = load_manifest(path)
+        except (IOError, OSError, ValueError):
+            manifest = {}
+        for digest, entry in queries.items():
+            if digest in manifest:
+                manifest[digest]['count'] += entry['count']
+            else:
+                manifest[digest] = entry
+        max_queries = conf.get_setting('warmup_max_queries', 1000)
+        entries = sorted(manifest.items(), key=lambda item: item[1]['count'], reverse=True)[:max_queries]
+        # write to a temporary file first so that readers never see a partial manifest
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'queries': dict(entries)}, f)
+            os.rename(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+
+def load_manifest(path):
+    """
+    Load queries of the manifest at path.
+
+    Returns
+    ~~~~~~~
+    Dictionary of query digest to manifest entry
+
+    """
+    with open(path) as f:
+        return json.load(f)['queries']
+
+
+def most_common(manifest, limit=None):
+    """
+    Manifest entries ordered by the number of times they were recorded.
+    """
+    entries = sorted(manifest.values(), key=lambda entry: entry['count'], reverse=True)
+    return entries[:limit] if limit else entries
+
+
+def warm(entry):
+    """
+    Evaluate the query of a manifest entry so that its results are cached. Raises
+    django.core.signing.BadSignature when the query was not signed with SECRET_KEY.
+
+    Returns
+    ~~~~~~~
+    Number of results
+    """
+    from .cache_manager import CachingQuerySet
+    query, options = pickle.loads(base64.b64decode(_signer().unsign(entry['query'])))
+    queryset = CachingQuerySet(conf.get_model(entry['model']), query=query, using=entry['db'])
+    queryset._cache_options = options
+    return len(queryset)
+
+
+def _signer():
+    # created for each use, so that SECRET_KEY is read when it is configured
+    return Signer(salt='django_cache_manager.warmup')
+
+
+class RateLimiter(object):
+    """
+    Spaces calls to wait so that at most rate calls per second are made. A rate of 0 does not limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call = time.time()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.time()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+recorder = QueryRecorder()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+import django
+from django.db import (
+    connection,
+    reset_queries
+)
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager import admission
+from django_cache_manager.admission import FrequencySketch
+from django_cache_manager.models import update_model_cache
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+def key(i):
+    return hashlib.md5(str(i).encode('ascii')).hexdigest()
+
+
+class FrequencySketchTests(TestCase):
+    """
+    Tests for django_cache_manager.admission.FrequencySketch
+    """
+
+    def test_increment(self):
+        """
+        Estimates count every occurrence of a key and saturate.
+        """
+        sketch = FrequencySketch(1024)
+        self.assertEqual(sketch.increment(key(1)), 1)
+        self.assertEqual(sketch.increment(key(1)), 2)
+        self.assertEqual(sketch.increment(key(2)), 1)
+        for i in range(20):
+            count = sketch.increment(key(1))
+        self.assertEqual(count, 15)
+
+    def test_aging(self):
+        """
+        Counters are halved after 10 * width additions.
+        """
+        sketch = FrequencySketch(16)
+        for i in range(8):
+            sketch.increment(key(1))
+        for i in range(2, 154):
+            sketch.increment(key(i))
+        self.assertTrue(sketch.increment(key(1)) <= 5)
+
+
+@override_settings(DEBUG=True)
+class AdmissionIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet with an admission policy
+    """
+
+    def setUp(self):
+        admission.reset()
+        ManufacturerFactory.create(name='Tesla')
+        reset_queries()
+
+    def tearDown(self):
+        admission.reset()
+
+    def test_min_seen(self):
+        """
+        Results are stored once the query has missed admission_min_seen times.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={'admission_min_seen': 2}):
+            for i in range(4):
+                list(Manufacturer.objects.filter(name='Tesla'))
+        self.assertEqual(len(connection.queries), 2)
+
+    def test_min_seen_after_invalidation(self):
+        """
+        Queries seen before their table is invalidated are stored on their first miss after it.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={'admission_min_seen': 2}):
+            for i in range(2):
+                list(Manufacturer.objects.filter(name='Tesla'))
+            update_model_cache(Manufacturer._meta.db_table)
+            reset_queries()
+            for i in range(3):
+                list(Manufacturer.objects.filter(name='Tesla'))
+        self.assertEqual(len(connection.queries), 1)
+
+    def test_min_db_time(self):
+        """
+        Results of queries faster than admission_min_db_time are not stored.
+        """
+        query_set = Manufacturer.objects.cache_options(admission_min_db_time=10000).filter(name='Tesla')
+        for i in range(2):
+            list(query_set._clone())
+        self.assertEqual(len(connection.queries), 2)
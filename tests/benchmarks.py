@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks of the caching hot paths with the sample models, against an in-memory sqlite database.
+
+    python tests/benchmarks.py --backend locmem --output before.json
+    python tests/benchmarks.py --backend locmem --compare before.json
+
+Each benchmark reports the median duration of a call in microseconds over several repeats. Results are saved as
+json with the versions they were measured with, and compared with the results of an earlier run, e.g. of another
+commit.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+
+here = os.path.abspath(os.path.dirname(__file__))
+sys.path[:0] = [here, os.path.dirname(here)]
+
+import django
+
+import settings
+
+BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django_cache_manager_benchmarks',
+        'TIMEOUT': 1800,
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/django_cache_manager_benchmarks',
+        'TIMEOUT': 1800,
+    },
+}
+ROW_COUNTS = (1, 10, 100, 1000)
+
+
+def setup(backend):
+    settings.DATABASES['default']['NAME'] = ':memory:'
+    settings.CACHES['django_cache_manager.cache_backend'] = BACKENDS[backend]
+    settings.LOGGING['root']['level'] = 'ERROR'
+    settings.LOGGING['loggers']['django']['level'] = 'ERROR'
+    if django.VERSION < (1, 6):
+        from django.core.management import setup_environ
+        setup_environ(settings)
+    else:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+        if django.VERSION >= (1, 7):
+            django.setup()
+    from django.core.management import call_command
+    if django.VERSION >= (1, 9):
+        call_command('migrate', run_syncdb=True, verbosity=0)
+    else:
+        call_command('syncdb', interactive=False, verbosity=0)
+
+
+def timed(func, number=100, repeat=5):
+    """
+    Median duration of a call of func in microseconds.
+    """
+    durations = []
+    for i in range(repeat):
+        start = time.time()
+        for j in range(number):
+            func()
+        durations.append((time.time() - start) * 1e6 / number)
+    return sorted(durations)[len(durations) // 2]
+
+
+def create_data():
+    from tests.factories import CarFactory, DriverFactory, ManufacturerFactory, MembershipFactory
+    for i in range(max(ROW_COUNTS)):
+        ManufacturerFactory.create(name='Manufacturer {0}'.format(i))
+    cars = [CarFactory.create(year=2000 + i % 10) for i in range(20)]
+    DriverFactory.create(cars=cars)
+    MembershipFactory.create()
+
+
+def bench_key_generation():
+    from tests.models import Car, Manufacturer
+    simple = Manufacturer.objects.filter(name='Tesla')
+    complex_ = (Car.objects.filter(make__name='Tesla', year__gte=2000).exclude(model='S')
+                .select_related('engine').order_by('-year')[:10])
+    return {
+        'key_generation.simple': timed(simple.generate_key),
+        'key_generation.complex': timed(complex_.generate_key),
+    }
+
+
+def bench_iterator():
+    from django_cache_manager.models import update_model_cache
+    from tests.models import Manufacturer
+    queryset = Manufacturer.objects.filter(name='Manufacturer 1')
+    list(queryset._clone())
+
+    def miss():
+        update_model_cache(Manufacturer._meta.db_table)
+        list(queryset._clone())
+
+    return {
+        'iterator.hit': timed(lambda: list(queryset._clone())),
+        'iterator.miss': timed(miss),
+    }
+
+
+def bench_serialization():
+    from tests.models import Manufacturer
+    results = {}
+    for rows in ROW_COUNTS:
+        result_set = list(Manufacturer.objects.order_by('id')[:rows])
+        data = pickle.dumps(result_set, pickle.HIGHEST_PROTOCOL)
+        number = max(1, 1000 // rows)
+        results['serialization.dumps.{0}'.format(rows)] = timed(
+            lambda: pickle.dumps(result_set, pickle.HIGHEST_PROTOCOL), number)
+        results['serialization.loads.{0}'.format(rows)] = timed(lambda: pickle.loads(data), number)
+        results['serialization.bytes.{0}'.format(rows)] = len(data)
+    return results
+
+
+def bench_invalidation():
+    """
+    Duration of the post_save receiver for models with few and many relations, and the number of tables
+    invalidated by it.
+    """
+    from django_cache_manager import hooks
+    from django_cache_manager.models import invalidate_model_cache
+    from tests.models import Car, Driver, Engine, Manufacturer, Membership
+
+    class CountingHook(hooks.Hook):
+        tables = 0
+
+        def before(self, step, **context):
+            if step == 'invalidation':
+                self.tables += 1
+
+    results = {}
+    for model in (Engine, Manufacturer, Driver, Membership, Car):
+        instance = model.objects.all()[0]
+        receiver = lambda: invalidate_model_cache(sender=model, instance=instance)
+        results['invalidation.{0}'.format(model.__name__)] = timed(receiver)
+        counter = CountingHook()
+        hooks.register(counter)
+        receiver()
+        hooks.unregister(counter)
+        results['invalidation.tables.{0}'.format(model.__name__)] = counter.tables
+    return results
+
+
+def run(backend):
+    setup(backend)
+    create_data()
+    results = {}
+    for benchmark in (bench_key_generation, bench_iterator, bench_serialization, bench_invalidation):
+        results.update(benchmark())
+    return {
+        'backend': backend,
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+
+
+def report(run_results, previous=None):
+    for name in sorted(run_results['results']):
+        value = run_results['results'][name]
+        line = '{0:<40} {1:>12.1f}'.format(name, value)
+        if previous and name in previous['results'] and previous['results'][name]:
+            line += ' {0:>+8.1%}'.format(value / previous['results'][name] - 1)
+        print(line)
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=here).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='locmem')
+    parser.add_argument('--output', help='Save results as json to this path')
+    parser.add_argument('--compare', help='Compare with results saved by an earlier run')
+    args = parser.parse_args()
+    run_results = run(args.backend)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    report(run_results, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run_results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
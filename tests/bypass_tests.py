@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager import stats
+from django_cache_manager.bypass import BypassTracker, tracker
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+BYPASS_OPTIONS = {
+    'adaptive_bypass': True,
+    'adaptive_bypass_window': 60,
+    'adaptive_bypass_min_writes': 3,
+    'adaptive_bypass_min_reuse': 1.0,
+    'stats': True,
+}
+
+
+@override_settings(DJANGO_CACHE_MANAGER=BYPASS_OPTIONS)
+class BypassTrackerTests(TestCase):
+    """
+    Tests for django_cache_manager.bypass.BypassTracker
+    """
+
+    def setUp(self):
+        self.tracker = BypassTracker()
+
+    def end_window(self, table_name, windows=1):
+        self.tracker._tables[table_name].started -= 60 * windows
+
+    def test_bypass_write_hot_table(self):
+        """
+        A table with many writes and few hits is bypassed after the window.
+        """
+        for i in range(3):
+            self.tracker.record_write('hot')
+        self.tracker.record_hit('hot')
+        self.assertFalse(self.tracker.is_bypassed('hot'))
+        self.end_window('hot')
+        self.assertTrue(self.tracker.is_bypassed('hot'))
+        self.assertEqual(self.tracker.bypassed_tables(), ['hot'])
+
+    def test_reused_table(self):
+        """
+        A table with more hits than writes is not bypassed.
+        """
+        for i in range(3):
+            self.tracker.record_write('reused')
+            self.tracker.record_hit('reused')
+            self.tracker.record_hit('reused')
+        self.end_window('reused')
+        self.assertFalse(self.tracker.is_bypassed('reused'))
+
+    def test_resume(self):
+        """
+        Caching resumes after a window with fewer writes, or after a window without activity.
+        """
+        for i in range(3):
+            self.tracker.record_write('hot')
+        self.end_window('hot')
+        self.assertTrue(self.tracker.is_bypassed('hot'))
+        self.end_window('hot')
+        self.assertFalse(self.tracker.is_bypassed('hot'))
+        for i in range(3):
+            self.tracker.record_write('hot')
+        self.end_window('hot', 2)
+        self.assertFalse(self.tracker.is_bypassed('hot'))
+
+    def test_idle_tables_forgotten(self):
+        """
+        Tables without activity for two windows are removed.
+        """
+        self.tracker.record_write('idle')
+        self.tracker.record_write('active')
+        self.end_window('idle', 2)
+        self.tracker._pruned -= 60
+        self.tracker.record_write('active')
+        self.assertEqual(sorted(self.tracker._tables), ['active'])
+
+    def test_writes_not_recorded_when_disabled(self):
+        """
+        Writes are not recorded without the adaptive_bypass option for any model.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={}):
+            self.tracker.record_write('table')
+        self.assertEqual(self.tracker._tables, {})
+        with override_settings(DJANGO_CACHE_MANAGER={'models': {'tests.Manufacturer': {'adaptive_bypass': True}}}):
+            self.tracker.record_write('table')
+        self.assertEqual(list(self.tracker._tables), ['table'])
+
+
+@override_settings(DJANGO_CACHE_MANAGER=BYPASS_OPTIONS)
+class BypassIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet with bypassed tables
+    """
+
+    def setUp(self):
+        tracker.reset()
+        stats.reset()
+        for i in range(3):
+            ManufacturerFactory.create(name='Tesla')
+        tracker._tables[Manufacturer._meta.db_table].started -= 60
+
+    def tearDown(self):
+        tracker.reset()
+
+    def test_bypass(self):
+        """
+        Queries of a bypassed table are served from the database and counted in stats.
+        """
+        self.assertEqual(len(Manufacturer.objects.filter(name='Tesla')), 3)
+        self.assertEqual(len(Manufacturer.objects.filter(name='Tesla')), 3)
+        model_stats = stats.get_stats('tests.Manufacturer')
+        self.assertEqual(model_stats['bypassed'], 2)
+        self.assertEqual(model_stats['misses'], 0)
+        self.assertEqual(model_stats['db']['count'], 2)
+
+    def test_option_disabled(self):
+        """
+        Tables are not bypassed without the adaptive_bypass option.
+        """
+        list(Manufacturer.objects.cache_options(adaptive_bypass=False).filter(name='Tesla'))
+        self.assertEqual(stats.get_stats('tests.Manufacturer')['bypassed'], 0)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager.conf import get_cache
+from django_cache_manager.model_cache_sharing import model_cache_backend
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class CacheAliasTests(TestCase):
+    """
+    Tests for routing results and table keys to cache aliases
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        get_cache('local').clear()
+
+    def test_model_cache_alias(self):
+        """
+        Results of models with the cache_alias option are cached in that alias.
+        """
+        options = {'models': {'tests.Manufacturer': {'cache_alias': 'local'}}}
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            query_set = Manufacturer.objects.filter(name='Tesla')
+            list(query_set)
+            cache_key = query_set.generate_key()
+            self.assertEqual(len(get_cache('local').get(cache_key).result_set), 1)
+            self.assertEqual(get_cache('django_cache_manager.cache_backend').get(cache_key), None)
+
+    def test_query_set_cache_alias(self):
+        """
+        The cache_alias option of a query set takes precedence.
+        """
+        query_set = Manufacturer.objects.cache_options(cache_alias='local').filter(name='Tesla')
+        list(query_set)
+        self.assertNotEqual(get_cache('local').get(query_set.generate_key()), None)
+        self.assertEqual(Manufacturer.objects.all().cache_backend,
+                         get_cache('django_cache_manager.cache_backend'))
+
+    def test_generation_cache_alias(self):
+        """
+        Table keys are shared in the generation_cache_alias.
+        """
+        table_name = Manufacturer._meta.db_table
+        with override_settings(DJANGO_CACHE_MANAGER={'generation_cache_alias': 'local'}):
+            ManufacturerFactory.create(name='Ford')
+            table_key = get_cache('local').get(table_name).table_key
+            self.assertEqual(model_cache_backend.retrieve_model_cache_info(table_name).table_key, table_key)
+        self.assertNotEqual(model_cache_backend.retrieve_model_cache_info(table_name).table_key, table_key)
@@ -4,13 +4,21 @@ import hashlib
 from unittest import TestCase
 from mock import patch, Mock
 
+import django
+from django.db.models.query import QuerySet
 from django.db.models.sql import EmptyResultSet
+from django.test import TestCase as DjangoTestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
 
 from django_cache_manager.cache_manager import (
     CacheManager,
     CachingQuerySet
 )
 from django_cache_manager.mixins import CacheKeyMixin
+from django_cache_manager.refresh_ahead import Refresher
 from .models import Manufacturer
 from tests.factories import ManufacturerFactory
 
@@ -92,3 +100,94 @@ class CachingQuerySetTests(TestCase):
         mock_generate_key.side_effect = EmptyResultSet()
         manufacturers = Manufacturer.objects.filter(name__in=[])
         self.assertEqual([], list(manufacturers))
+
+
+class CachingQuerySetOptionsTests(TestCase):
+    """
+    Tests for options of django_cache_manager.cache_manager.CachingQuerySet
+    """
+
+    def test_cache_options_override_settings(self):
+        """
+        Query set options take precedence over model and global options.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={'cache_prefetch': False}):
+            query_set = Manufacturer.objects.all()
+            self.assertFalse(query_set.get_cache_option('cache_prefetch'))
+            self.assertTrue(query_set.cache_options(cache_prefetch=True).get_cache_option('cache_prefetch'))
+
+    def test_model_options_override_global_options(self):
+        """
+        Model options take precedence over global options.
+        """
+        options = {
+            'cache_prefetch': False,
+            'models': {
+                'tests.Manufacturer': {'cache_prefetch': True},
+            },
+        }
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            self.assertTrue(Manufacturer.objects.all().get_cache_option('cache_prefetch'))
+
+    def test_cache_options_survive_clone(self):
+        """
+        Options are kept when the query set is cloned.
+        """
+        query_set = Manufacturer.objects.cache_options(cache_prefetch=True).filter(name='name')
+        self.assertTrue(query_set.get_cache_option('cache_prefetch'))
+
+    def test_pickle_without_cache_backend(self):
+        """
+        Query sets can be pickled after the cache backend is accessed.
+        """
+        query_set = Manufacturer.objects.filter(name='name')
+        query_set.cache_backend
+        self.assertNotIn('_cache_backend', query_set.__getstate__())
+
+
+@patch.object(Refresher, '_start', lambda self, key, refresh, using: (refresh(), self._done(key)))
+class RefreshAheadTests(DjangoTestCase):
+    """
+    Tests for refresh-ahead of django_cache_manager.cache_manager.CachingQuerySet
+    """
+
+    def setUp(self):
+        self.manufacturer = ManufacturerFactory.create(name='name')
+        list(Manufacturer.objects.filter(name='name'))
+
+    def get_names(self):
+        return [m.name for m in Manufacturer.objects.filter(name='name')]
+
+    def test_refresh_popular_entry_near_expiry(self):
+        """
+        Reading a popular entry near expiry returns the cached result and refreshes the entry.
+        """
+        options = {'refresh_ahead': 1.0, 'refresh_ahead_min_hits': 2}
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            with patch.object(CachingQuerySet, '_refresh', autospec=True) as mock_refresh:
+                self.get_names()
+                self.assertEqual(mock_refresh.call_count, 0)
+                self.get_names()
+                self.assertEqual(mock_refresh.call_count, 1)
+
+    def test_refresh_replaces_entry(self):
+        """
+        Refresh replaces the cached result with the current rows.
+        """
+        query_set = Manufacturer.objects.filter(id=self.manufacturer.id)
+        self.assertEqual(list(query_set._clone())[0].name, 'name')
+        # update the row without invalidating the cache
+        QuerySet.update(query_set, name='refreshed')
+        self.assertEqual(list(query_set._clone())[0].name, 'name')
+        query_set._refresh(query_set.generate_key())
+        self.assertEqual(list(query_set._clone())[0].name, 'refreshed')
+
+    def test_no_refresh_for_fresh_entry(self):
+        """
+        Entries that are not near expiry are not refreshed.
+        """
+        options = {'refresh_ahead': 0.1, 'refresh_ahead_min_hits': 1}
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            with patch.object(CachingQuerySet, '_refresh', autospec=True) as mock_refresh:
+                self.get_names()
+        self.assertEqual(mock_refresh.call_count, 0)
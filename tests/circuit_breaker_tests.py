@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import time
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+from mock import patch
+
+from django_cache_manager.circuit_breaker import FAILED, CircuitBreaker, breaker
+from django_cache_manager.model_cache_sharing import model_cache_backend
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+def fail():
+    raise IOError('cache backend is down')
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'circuit_breaker': True, 'circuit_breaker_failures': 2,
+                                         'circuit_breaker_reset': 30})
+class CircuitBreakerTests(TestCase):
+    """
+    Tests for django_cache_manager.circuit_breaker.CircuitBreaker
+    """
+
+    def setUp(self):
+        self.breaker = CircuitBreaker()
+
+    def test_open_after_failures(self):
+        """
+        The circuit opens after consecutive failures and calls are skipped.
+        """
+        self.assertEqual(self.breaker.call(fail), FAILED)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(self.breaker.call(fail), FAILED)
+        self.assertTrue(self.breaker.is_open)
+        self.assertEqual(self.breaker.call(lambda: 1), FAILED)
+
+    def test_slow_calls(self):
+        """
+        Calls slower than the latency budget are failures but return their result.
+        """
+        with self.settings(DJANGO_CACHE_MANAGER={'circuit_breaker': True, 'circuit_breaker_failures': 1,
+                                                 'circuit_breaker_latency': 0}):
+            self.assertEqual(self.breaker.call(lambda: time.sleep(0.001) or 1), 1)
+            self.assertTrue(self.breaker.is_open)
+
+    def test_probe(self):
+        """
+        After the reset interval a successful probe closes the circuit and recovery callbacks are called.
+        """
+        recovered = []
+        self.breaker.on_recovery(lambda: recovered.append(True))
+        self.breaker.call(fail)
+        self.breaker.call(fail)
+        self.breaker.opened -= 30
+        self.assertEqual(self.breaker.call(lambda: 1), 1)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(recovered, [True])
+
+    def test_disabled(self):
+        """
+        Without the circuit_breaker option errors are raised.
+        """
+        with self.settings(DJANGO_CACHE_MANAGER={}):
+            self.assertRaises(IOError, self.breaker.call, fail)
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'circuit_breaker': True, 'circuit_breaker_failures': 1})
+class CircuitBreakerIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet and SharedMemory with a failing cache backend
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        breaker.reset()
+
+    def tearDown(self):
+        breaker.reset()
+
+    def test_queries_served_from_database(self):
+        """
+        Queries are served from the database while the cache backend fails.
+        """
+        with patch.object(model_cache_backend.cache_backend, 'get', side_effect=IOError):
+            self.assertEqual([m.name for m in Manufacturer.objects.filter(name='Tesla')], ['Tesla'])
+            self.assertTrue(breaker.is_open)
+            self.assertEqual([m.name for m in Manufacturer.objects.filter(name='Tesla')], ['Tesla'])
+
+    def test_pending_invalidations(self):
+        """
+        Invalidations made while the circuit is open are shared when it closes.
+        """
+        table_name = Manufacturer._meta.db_table
+        list(Manufacturer.objects.all())
+        table_key = model_cache_backend.retrieve_model_cache_info(table_name).table_key
+        with patch.object(model_cache_backend.cache_backend, 'set', side_effect=IOError):
+            ManufacturerFactory.create(name='Ford')
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(model_cache_backend.cache_backend.get(table_name).table_key, table_key)
+        breaker.opened -= 30
+        model_cache_backend.retrieve_model_cache_info(table_name)
+        self.assertFalse(breaker.is_open)
+        self.assertNotEqual(model_cache_backend.cache_backend.get(table_name).table_key, table_key)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+from mock import patch
+
+from django_cache_manager.cache_manager import CachingQuerySet
+from django_cache_manager.generations import FreshGenerations, fresh_generations
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'skip_fresh_misses': 60})
+class FreshGenerationsTests(TestCase):
+    """
+    Tests for django_cache_manager.generations.FreshGenerations
+    """
+
+    def setUp(self):
+        self.generations = FreshGenerations()
+
+    def test_fresh_generation(self):
+        """
+        Keys not cached under a fresh table key are misses.
+        """
+        self.assertFalse(self.generations.is_miss(('table_key',), 'key'))
+        self.generations.created('table_key')
+        self.assertTrue(self.generations.is_miss(('table_key',), 'key'))
+        self.assertTrue(self.generations.is_miss(('other_table_key', 'table_key'), 'key'))
+        self.generations.populated(('table_key',), 'key')
+        self.assertFalse(self.generations.is_miss(('table_key',), 'key'))
+
+    def test_expired_generation(self):
+        """
+        Table keys are fresh for skip_fresh_misses seconds only.
+        """
+        self.generations.created('table_key')
+        with self.settings(DJANGO_CACHE_MANAGER={'skip_fresh_misses': 0.000001}):
+            self.generations.created('other_table_key')
+        self.assertFalse('table_key' in self.generations._generations)
+
+    def test_disabled(self):
+        """
+        Nothing is tracked without the skip_fresh_misses option.
+        """
+        with self.settings(DJANGO_CACHE_MANAGER={}):
+            self.generations.created('table_key')
+        self.assertFalse(self.generations.is_miss(('table_key',), 'key'))
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'skip_fresh_misses': 60})
+class FreshGenerationsIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet skipping reads under fresh table keys
+    """
+
+    def setUp(self):
+        fresh_generations.reset()
+
+    def tearDown(self):
+        fresh_generations.reset()
+
+    def test_skip_cache_get_after_invalidation(self):
+        """
+        The cache is not read after an invalidation until the result is cached by this process.
+        """
+        ManufacturerFactory.create(name='Tesla')
+        query_set = Manufacturer.objects.filter(name='Tesla')
+        with patch.object(query_set.cache_backend, 'get', wraps=query_set.cache_backend.get) as cache_get:
+            self.assertEqual(len(query_set._clone()), 1)
+            table_key_reads = cache_get.call_count
+            self.assertEqual(len(query_set._clone()), 1)
+            self.assertEqual(cache_get.call_count, 2 * table_key_reads + 1)
+
+    def test_skip_superset_after_invalidation(self):
+        """
+        Cached supersets are not read either after an invalidation.
+        """
+        ManufacturerFactory.create(name='Tesla')
+        query_set = Manufacturer.objects.cache_options(superset_max_rows=100).filter(name='Tesla')[:1]
+        with patch.object(CachingQuerySet, '_get_from_superset', return_value=None) as get_from_superset:
+            self.assertEqual(len(query_set), 1)
+        self.assertEqual(get_from_superset.call_count, 0)
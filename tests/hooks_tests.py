@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from django.test import TestCase
+
+from django_cache_manager import hooks
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class RecordingHook(hooks.Hook):
+
+    def __init__(self):
+        self.calls = []
+
+    def before(self, step, **context):
+        self.calls.append(('before', step))
+
+    def after(self, step, **context):
+        self.calls.append(('after', step))
+
+
+class HooksTests(TestCase):
+    """
+    Tests for django_cache_manager.hooks
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        self.hook = RecordingHook()
+        hooks.register(self.hook)
+
+    def tearDown(self):
+        hooks.unregister(self.hook)
+
+    def test_miss_and_hit(self):
+        """
+        Hooks are called around each step of a miss and of a hit.
+        """
+        list(Manufacturer.objects.filter(name='Tesla'))
+        steps = [step for event, step in self.hook.calls if event == 'before']
+        self.assertEqual([step for step in steps if step != 'retrieve'],
+                         ['key_generation', 'cache_get', 'db', 'cache_set'])
+        self.hook.calls = []
+        list(Manufacturer.objects.filter(name='Tesla'))
+        steps = [step for event, step in self.hook.calls if event == 'before']
+        self.assertEqual([step for step in steps if step != 'retrieve'], ['key_generation', 'cache_get'])
+
+    def test_invalidation(self):
+        """
+        Hooks are called around invalidations and sharing of table keys.
+        """
+        ManufacturerFactory.create(name='Ford')
+        self.assertTrue(('before', 'invalidation') in self.hook.calls)
+        self.assertTrue(('after', 'share') in self.hook.calls)
+
+    def test_unregister(self):
+        """
+        Unregistered hooks are not called.
+        """
+        hooks.unregister(self.hook)
+        list(Manufacturer.objects.all())
+        self.assertEqual(self.hook.calls, [])
+        self.assertFalse(hooks.active)
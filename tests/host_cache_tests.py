@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager.host_cache import HostCache
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+def key(i):
+    return '{0:032x}'.format(i)
+
+
+class HostCacheTests(TestCase):
+    """
+    Tests for django_cache_manager.host_cache.HostCache
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.host_cache = HostCache(self.directory, 4000, 4, 64)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_and_set(self):
+        """
+        Values are returned until they are evicted.
+        """
+        self.host_cache.set(key(1), [1, 2, 3])
+        self.assertEqual(self.host_cache.get(key(1)), [1, 2, 3])
+        self.assertEqual(self.host_cache.get(key(2)), None)
+        for i in range(2, 40):
+            self.host_cache.set(key(i), 'x' * 300)
+        self.assertEqual(self.host_cache.get(key(1)), None)
+        self.assertEqual(self.host_cache.get(key(39)), 'x' * 300)
+
+    def test_recently_read_entries_are_kept(self):
+        """
+        Entries read from older segments are moved to the current segment.
+        """
+        self.host_cache.set(key(1), 'a' * 300)
+        for i in range(2, 30):
+            self.host_cache.set(key(i), 'x' * 300)
+            self.assertEqual(self.host_cache.get(key(1)), 'a' * 300)
+
+    def test_shared_by_instances(self):
+        """
+        Another instance for the same directory, e.g. in another process, reads the same entries and layout.
+        """
+        self.host_cache.set(key(1), 'a')
+        other = HostCache(self.directory, 8000, 8, 128)
+        self.assertEqual(other.get(key(1)), 'a')
+        self.assertEqual(other._segment_count, 4)
+
+    def test_too_large(self):
+        """
+        Values larger than a segment are not stored.
+        """
+        self.assertFalse(self.host_cache.set(key(1), 'x' * 2000))
+        self.assertEqual(self.host_cache.get(key(1)), None)
+        self.assertTrue(self.host_cache.set(key(1), 'x'))
+
+
+class HostCacheIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet with a host tier
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for i in range(3):
+            ManufacturerFactory.create(name='Tesla')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_large_results_in_host_tier(self):
+        """
+        Results with at least host_cache_min_rows rows are stored in the host tier instead of the cache backend.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={'host_cache_dir': self.directory, 'host_cache_min_rows': 2}):
+            query_set = Manufacturer.objects.filter(name='Tesla')
+            self.assertEqual(len(query_set), 3)
+            cache_key = query_set.generate_key()
+            self.assertEqual(query_set.cache_backend.get(cache_key), None)
+            self.assertEqual(len(query_set._get_cached_entry(cache_key).result_set), 3)
+            small = Manufacturer.objects.filter(name='Tesla')[:1]
+            list(small)
+            self.assertNotEqual(small.cache_backend.get(small.generate_key()), None)
+
+    def test_results_larger_than_a_segment(self):
+        """
+        Results that do not fit in a segment of the host tier are stored in the cache backend.
+        """
+        options = {
+            'host_cache_dir': os.path.join(self.directory, 'small'),
+            'host_cache_size': 400,
+            'host_cache_segments': 4,
+            'host_cache_min_rows': 2,
+        }
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            query_set = Manufacturer.objects.filter(name='Tesla')
+            self.assertEqual(len(query_set), 3)
+            self.assertEqual(len(query_set.cache_backend.get(query_set.generate_key()).result_set), 3)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager.lazy import LazyResultSet, dump_chunks
+from django_cache_manager.types import ChunkedResult
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class LazyResultSetTests(TestCase):
+    """
+    Tests for django_cache_manager.lazy.LazyResultSet
+    """
+
+    def setUp(self):
+        self.rows = list(range(10))
+        self.result_set = LazyResultSet(dump_chunks(self.rows, 3), 10, 3)
+
+    def test_sequence(self):
+        """
+        The rows of the chunks are iterated, indexed and sliced as a list.
+        """
+        self.assertEqual(len(self.result_set), 10)
+        self.assertEqual(list(self.result_set), self.rows)
+        self.assertEqual(self.result_set[4], 4)
+        self.assertEqual(self.result_set[-1], 9)
+        self.assertRaises(IndexError, lambda: self.result_set[10])
+        for index in (slice(0, 10), slice(2, 7), slice(3, 6), slice(8, None), slice(None, -2), slice(1, 9, 2)):
+            self.assertEqual(self.result_set[index], self.rows[index])
+
+    def test_partial_last_chunk(self):
+        """
+        Rows are indexed by the chunk size when the last chunk is not full.
+        """
+        rows = list(range(250))
+        result_set = LazyResultSet(dump_chunks(rows, 100), 250, 100)
+        self.assertEqual(result_set[90], 90)
+        self.assertEqual(result_set[249], 249)
+        for index in (slice(90, 95), slice(95, 105), slice(190, 250), slice(240, 260)):
+            self.assertEqual(result_set[index], rows[index])
+        self.assertEqual(list(result_set), rows)
+
+    def test_chunks_loaded_on_demand(self):
+        """
+        Chunks are deserialized when they are first read.
+        """
+        iterator = iter(self.result_set)
+        next(iterator)
+        self.assertEqual(self.result_set._loaded[1:], [None] * 3)
+        self.assertEqual(self.result_set[3:5], [3, 4])
+        self.assertEqual(self.result_set._loaded[2:], [None] * 2)
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'lazy_chunk_size': 2})
+class LazyIntegrationTests(TestCase):
+    """
+    Tests of CachingQuerySet with lazily deserialized results
+    """
+
+    def setUp(self):
+        for i in range(5):
+            ManufacturerFactory.create(name='Tesla')
+
+    def test_chunked_result(self):
+        """
+        Results of more than lazy_chunk_size rows are cached in chunks and read back lazily.
+        """
+        query_set = Manufacturer.objects.filter(name='Tesla')
+        expected = list(query_set._clone())
+        key = query_set.generate_key()
+        self.assertTrue(isinstance(query_set.cache_backend.get(key), ChunkedResult))
+        self.assertEqual(list(query_set._clone()), expected)
+        result_set = query_set._get_cached_entry(key).result_set
+        self.assertTrue(isinstance(result_set, LazyResultSet))
+        self.assertEqual(next(iter(result_set)), expected[0])
+        self.assertEqual(result_set._loaded[1:], [None, None])
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Load simulation of many worker processes reading and writing the sample models through a shared cache.
+
+    python tests/load_simulation.py --workers 8 --duration 10 --write-ratio 0.05
+    python tests/load_simulation.py --sharing myapp.sharing.MySharing --output results.json
+
+Workers share an sqlite database and, by default, a cache server stand-in: a process serving a dictionary of
+pickled values over a local socket, so that every cache operation is a round trip like with memcached. Reports
+throughput, latency percentiles, database queries made on cache misses, misses shortly after writes and stale
+reads. A read of a manufacturer is stale when it returns a name older than the last write that completed before
+the read started; its staleness is the time since that write.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+from multiprocessing.managers import BaseManager
+
+here = os.path.abspath(os.path.dirname(__file__))
+sys.path[:0] = [here, os.path.dirname(here)]
+
+import django
+from django.core.cache.backends.base import BaseCache
+try:
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+except ImportError:
+    # django < 1.6
+    DEFAULT_TIMEOUT = None
+
+import settings
+
+AUTHKEY = b'django_cache_manager'
+READS = ('manufacturer', 'cars', 'drivers')
+
+
+class CacheStore(object):
+    """
+    Dictionary of keys to pickled values and their expiry times, served by the cache server stand-in.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        value, expires = self._data.get(key, (None, None))
+        if expires is not None and expires < time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key, value, expires):
+        self._data[key] = (value, expires)
+
+    def add(self, key, value, expires):
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, expires)
+        return True
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+_store = CacheStore()
+
+
+def _get_store():
+    return _store
+
+
+class CacheServer(BaseManager):
+    pass
+
+
+CacheServer.register('store', callable=_get_store)
+
+
+class ServerCache(BaseCache):
+    """
+    Django cache backend of the cache server stand-in, LOCATION being its 'host:port'. Each process connects once.
+    """
+
+    def __init__(self, location, params):
+        super(ServerCache, self).__init__(params)
+        host, port = location.split(':')
+        self._address = (host, int(port))
+        self._pid = None
+        self._store = None
+
+    @property
+    def store(self):
+        if self._pid != os.getpid():
+            client = CacheServer(address=self._address, authkey=AUTHKEY)
+            client.connect()
+            self._store = client.store()
+            self._pid = os.getpid()
+        return self._store
+
+    def get(self, key, default=None, version=None):
+        value = self.store.get(self.make_key(key, version))
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store.set(self.make_key(key, version), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                       self._expires(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store.add(self.make_key(key, version), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                              self._expires(timeout))
+
+    def delete(self, key, version=None):
+        self.store.delete(self.make_key(key, version))
+
+    def clear(self):
+        self.store.clear()
+
+    def _expires(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else time.time() + timeout
+
+
+def setup(database, cache_location, sharing_backend):
+    settings.DATABASES['default']['NAME'] = database
+    settings.DATABASES['default']['OPTIONS'] = {'timeout': 30}
+    if cache_location:
+        settings.CACHES['django_cache_manager.cache_backend'] = {
+            'BACKEND': 'load_simulation.ServerCache',
+            'LOCATION': cache_location,
+            'TIMEOUT': 1800,
+        }
+    else:
+        settings.CACHES['django_cache_manager.cache_backend']['LOCATION'] = tempfile.mkdtemp()
+    if sharing_backend:
+        settings.DJANGO_CACHE_MANAGER = {'sharing_backend': sharing_backend}
+    settings.LOGGING['root']['level'] = 'ERROR'
+    settings.LOGGING['loggers']['django']['level'] = 'ERROR'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    if django.VERSION >= (1, 7):
+        django.setup()
+
+
+def create_data(rows):
+    from django.core.management import call_command
+    from tests.factories import CarFactory, DriverFactory, ManufacturerFactory
+    if django.VERSION >= (1, 9):
+        call_command('migrate', run_syncdb=True, verbosity=0)
+    else:
+        call_command('syncdb', interactive=False, verbosity=0)
+    for i in range(rows):
+        manufacturer = ManufacturerFactory.create(name='v0')
+        DriverFactory.create(cars=[CarFactory.create(make=manufacturer) for j in range(3)])
+
+
+def close_connections():
+    # connections must not be shared with forked workers
+    from django.db import connections
+    for connection in connections.all():
+        connection.close()
+
+
+class Shared(object):
+    """
+    State shared by all workers: the last version written of each manufacturer and when the write completed.
+    """
+
+    def __init__(self, rows):
+        self.lock = multiprocessing.Lock()
+        self.versions = multiprocessing.Array('i', rows + 1, lock=False)
+        self.written = multiprocessing.Array('d', rows + 1, lock=False)
+        self.last_write = multiprocessing.Value('d', 0, lock=False)
+
+
+def work(worker, args, shared, results):
+    from django_cache_manager import hooks
+    from tests.models import Car, Driver, Manufacturer
+
+    rng = random.Random(args.seed + worker)
+    result = {
+        'reads': [], 'writes': [], 'db_queries': 0, 'misses_after_write': 0, 'stale': [], 'errors': 0,
+    }
+
+    class DatabaseCounter(hooks.Hook):
+        def before(self, step, **context):
+            if step == 'db':
+                result['db_queries'] += 1
+                if time.time() - shared.last_write.value <= args.storm_window / 1000.0:
+                    result['misses_after_write'] += 1
+
+    hooks.register(DatabaseCounter())
+    deadline = time.time() + args.duration
+    while time.time() < deadline:
+        row = rng.randint(1, args.rows)
+        start = time.time()
+        try:
+            if rng.random() < args.write_ratio:
+                with shared.lock:
+                    version = shared.versions[row] + 1
+                    manufacturer = Manufacturer.objects.get(id=row)
+                    manufacturer.name = 'v{0}'.format(version)
+                    manufacturer.save()
+                    shared.versions[row] = version
+                    shared.written[row] = shared.last_write.value = time.time()
+                result['writes'].append((time.time() - start) * 1000)
+                continue
+            read = rng.choice(READS)
+            if read == 'manufacturer':
+                expected, written = shared.versions[row], shared.written[row]
+                version = int(Manufacturer.objects.get(id=row).name[1:])
+                if version < expected:
+                    result['stale'].append((time.time() - written) * 1000)
+            elif read == 'cars':
+                list(Car.objects.filter(make_id=row))
+            else:
+                list(Driver.objects.filter(cars__make_id=row).distinct())
+            result['reads'].append((time.time() - start) * 1000)
+        except Exception:
+            result['errors'] += 1
+    results.put(result)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(worker_results, duration):
+    reads = [latency for result in worker_results for latency in result['reads']]
+    writes = [latency for result in worker_results for latency in result['writes']]
+    stale = [staleness for result in worker_results for staleness in result['stale']]
+    db_queries = sum(result['db_queries'] for result in worker_results)
+    summary = {
+        'throughput': (len(reads) + len(writes)) / float(duration),
+        'reads': len(reads),
+        'writes': len(writes),
+        'errors': sum(result['errors'] for result in worker_results),
+        'db_queries': db_queries,
+        'hit_ratio': 1 - db_queries / float(len(reads)) if reads else None,
+        'misses_after_write': sum(result['misses_after_write'] for result in worker_results),
+        'stale_reads': len(stale),
+        'staleness_max': max(stale) if stale else None,
+    }
+    for fraction in (0.5, 0.95, 0.99):
+        name = 'p{0}'.format(int(fraction * 100))
+        summary['read_latency_' + name] = percentile(reads, fraction)
+        summary['write_latency_' + name] = percentile(writes, fraction)
+        summary['staleness_' + name] = percentile(stale, fraction)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds')
+    parser.add_argument('--rows', type=int, default=50, help='Number of manufacturers')
+    parser.add_argument('--write-ratio', type=float, default=0.05, help='Fraction of operations that are writes')
+    parser.add_argument('--cache', choices=('server', 'file'), default='server',
+                        help='Cache server stand-in or file based cache')
+    parser.add_argument('--sharing', help='Dotted path of the sharing backend class')
+    parser.add_argument('--storm-window', type=float, default=100,
+                        help='Milliseconds after a write in which misses are counted as misses after write')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Save results as json to this path')
+    args = parser.parse_args()
+
+    cache_location = None
+    if args.cache == 'server':
+        server = CacheServer(address=('127.0.0.1', 0), authkey=AUTHKEY)
+        server.start()
+        cache_location = '{0}:{1}'.format(*server.address)
+    database = os.path.join(tempfile.mkdtemp(), 'load_simulation.db')
+    setup(database, cache_location, args.sharing)
+    create_data(args.rows)
+    close_connections()
+
+    shared = Shared(args.rows)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=work, args=(worker, args, shared, results))
+               for worker in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    worker_results = [results.get() for worker in workers]
+    for worker in workers:
+        worker.join()
+    if args.cache == 'server':
+        server.shutdown()
+
+    summary = summarize(worker_results, args.duration)
+    summary.update(workers=args.workers, write_ratio=args.write_ratio, cache=args.cache,
+                   sharing=args.sharing or 'default')
+    for name in sorted(summary):
+        print('{0:<24} {1}'.format(name, summary[name]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+import django
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.client import RequestFactory
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from django_cache_manager.metrics import (
+    MmapedDict,
+    ProcessMetrics,
+    collect,
+    generate_latest,
+    metric_key,
+    process_metrics,
+)
+from django_cache_manager.views import metrics
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class MetricsTests(TestCase):
+    """
+    Tests for django_cache_manager.metrics
+    """
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        # metrics file of the test process is opened in the temporary directory
+        process_metrics._pid = None
+
+    def tearDown(self):
+        process_metrics._pid = None
+        shutil.rmtree(self.metrics_dir)
+
+    def test_mmaped_dict(self):
+        """
+        Values are kept in the file when it grows and when it is reopened.
+        """
+        path = os.path.join(self.metrics_dir, 'metrics_1.db')
+        values = MmapedDict(path)
+        for i in range(5000):
+            values.increment(metric_key('metric', index=str(i)), 1)
+        values.increment(metric_key('metric', index='0'), 2.5)
+        values.close()
+        values = MmapedDict(path)
+        values.increment(metric_key('metric', index='1'), 1)
+        values.close()
+        collected = collect(self.metrics_dir)
+        self.assertEqual(len(collected), 5000)
+        self.assertEqual(collected[('metric', (('index', '0'),))], 3.5)
+        self.assertEqual(collected[('metric', (('index', '1'),))], 2)
+
+    def test_collect_sums_processes(self):
+        """
+        Metrics of all process files are summed.
+        """
+        for pid in (1, 2):
+            values = MmapedDict(os.path.join(self.metrics_dir, 'metrics_{0}.db'.format(pid)))
+            values.increment(metric_key('django_cache_manager_queries_total', model='m', outcome='hit'), pid)
+            values.close()
+        self.assertEqual(collect(self.metrics_dir),
+                         {('django_cache_manager_queries_total', (('model', 'm'), ('outcome', 'hit'))): 3})
+
+    def test_exposition(self):
+        """
+        Evaluations and invalidations are exposed in Prometheus text format.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={'metrics_dir': self.metrics_dir}):
+            ManufacturerFactory.create(name='Tesla')
+            for i in range(2):
+                list(Manufacturer.objects.filter(name='Tesla'))
+        text = generate_latest(self.metrics_dir)
+        self.assertIn('# TYPE django_cache_manager_queries_total counter', text)
+        self.assertIn('django_cache_manager_queries_total{model="tests.Manufacturer",outcome="hit"} 1.0', text)
+        self.assertIn('django_cache_manager_queries_total{model="tests.Manufacturer",outcome="miss"} 1.0', text)
+        self.assertIn('django_cache_manager_invalidations_total{table="tests_manufacturer"}', text)
+        self.assertIn('# TYPE django_cache_manager_db_milliseconds histogram', text)
+        self.assertIn('django_cache_manager_db_milliseconds_bucket{le="+Inf",model="tests.Manufacturer"} 1.0', text)
+        self.assertIn('django_cache_manager_cache_get_milliseconds_count{model="tests.Manufacturer"} 2.0', text)
+
+    def test_view_and_command(self):
+        """
+        Metrics view and cache_metrics command return the exposition.
+        """
+        ProcessMetrics().increment(self.metrics_dir, metric_key('django_cache_manager_queries_total',
+                                                                model='m', outcome='hit'))
+        with override_settings(DJANGO_CACHE_MANAGER={'metrics_dir': self.metrics_dir}):
+            response = metrics(RequestFactory().get('/metrics'))
+            out = StringIO()
+            call_command('cache_metrics', stdout=out)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'django_cache_manager_queries_total{model="m",outcome="hit"} 1.0', response.content)
+        self.assertEqual(out.getvalue(), generate_latest(self.metrics_dir))
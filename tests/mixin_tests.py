@@ -4,12 +4,28 @@ import hashlib
 from unittest import TestCase
 from mock import patch, Mock
 
+import django
+from django.db.models import Q
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
 from django_cache_manager.mixins import (
     CacheKeyMixin,
     CacheInvalidateMixin
 )
 from django_cache_manager.model_cache_sharing.types import ModelCacheInfo
-from .models import Manufacturer
+from .models import (
+    Auto,
+    Car,
+    Driver,
+    Manufacturer,
+)
+from .factories import (
+    DriverFactory,
+    ManufacturerFactory,
+)
 
 
 @patch('django_cache_manager.mixins.model_cache_backend')
@@ -106,3 +122,132 @@ class CacheInvalidateMixinTests(TestCase):
         mock_uuid.uuid4.return_value = mock_uuid4
         self.mixin.invalidate_model_cache()
         self.assertEquals(mock_model_cache.share_model_cache_info.call_count, 2)
+
+
+@patch('django_cache_manager.mixins.model_cache_backend')
+class PrefetchKeyTests(TestCase):
+    """
+    Tests for prefetch keys of django_cache_manager.mixins.CacheKeyMixin
+    """
+
+    def test_prefetch_tables(self, mock_model_cache):
+        """
+        Tables of all models traversed by prefetch lookups are part of the object graph.
+        """
+        query_set = Manufacturer.objects.prefetch_related('cars__engine')
+        self.assertEqual(query_set.prefetch_tables(), set(['tests_manufacturer', 'tests_car', 'tests_engine']))
+
+    def test_prefetch_tables_unknown_lookup(self, mock_model_cache):
+        """
+        Object graph can not be determined for lookups that are not relations.
+        """
+        query_set = Manufacturer.objects.prefetch_related('unknown')
+        self.assertEqual(query_set.prefetch_tables(), None)
+
+    def test_prefetch_key_changes_with_related_table_key(self, mock_model_cache):
+        """
+        Prefetch key changes when the key of a related table changes.
+        """
+        table_keys = {'tests_manufacturer': 'key1', 'tests_car': 'key2'}
+        mock_model_cache.retrieve_model_cache_info.side_effect = lambda table: ModelCacheInfo(table, table_keys[table])
+        query_set = Manufacturer.objects.prefetch_related('cars')
+        key1 = query_set.generate_prefetch_key()
+        table_keys['tests_car'] = 'key3'
+        key2 = query_set.generate_prefetch_key()
+        self.assertNotEqual(key1, key2)
+
+
+class RelatedCollectionTests(TestCase):
+    """
+    Tests for related collections of django_cache_manager.mixins.CacheKeyMixin
+    """
+
+    def setUp(self):
+        self.manufacturer = ManufacturerFactory.create()
+
+    def test_reverse_foreign_key_collection(self):
+        """
+        Reverse foreign key manager reads the collection of its instance.
+        """
+        field, value = self.manufacturer.cars.all().related_collection()
+        self.assertEqual(field, Car._meta.get_field('make'))
+        self.assertEqual(value, self.manufacturer.id)
+
+    def test_many_to_many_collection(self):
+        """
+        Many-to-many manager reads the collection of its instance through the intermediate table.
+        """
+        driver = DriverFactory.create()
+        field, value = driver.cars.all().related_collection()
+        self.assertEqual(field.model, Driver.cars.through)
+        self.assertEqual(value, driver.id)
+
+    def test_join_is_not_collection(self):
+        """
+        Queries joining other tables are not collections.
+        """
+        self.assertEqual(Car.objects.filter(make=self.manufacturer, make__name='name').related_collection(), None)
+        self.assertEqual(self.manufacturer.cars.select_related('make').related_collection(), None)
+
+    def test_foreign_key_of_joined_table_is_not_collection(self):
+        """
+        Foreign keys of a joined table that does not reference the model are not collections.
+        """
+        self.assertEqual(Auto.objects.filter(maker__country=1).related_collection(), None)
+        self.assertEqual(Auto.objects.filter(maker__country_id=1).related_collection(), None)
+
+
+class CanonicalKeyTests(TestCase):
+    """
+    Tests for canonical keys of django_cache_manager.mixins.CacheKeyMixin
+    """
+
+    def test_filter_order(self):
+        """
+        Conditions added in a different order have the same canonical sql.
+        """
+        query_set1 = Car.objects.filter(year=2015).filter(model='Civic').filter(make__name='Honda')
+        query_set2 = Car.objects.filter(make__name='Honda').filter(model='Civic', year=2015)
+        self.assertNotEqual(query_set1.sql(), query_set2.sql())
+        self.assertEqual(query_set1.canonical_sql(), query_set2.canonical_sql())
+
+    def test_in_values_order(self):
+        """
+        Values of __in lookups in a different order have the same canonical sql.
+        """
+        self.assertEqual(Manufacturer.objects.filter(pk__in=[3, 1, 2]).canonical_sql(),
+                         Manufacturer.objects.filter(pk__in=[1, 2, 3]).canonical_sql())
+
+    def test_different_queries(self):
+        """
+        Different queries have different canonical sql.
+        """
+        self.assertNotEqual(Manufacturer.objects.filter(name='a').canonical_sql(),
+                            Manufacturer.objects.exclude(name='a').canonical_sql())
+        self.assertNotEqual(Manufacturer.objects.filter(name='a', id=1).canonical_sql(),
+                            Manufacturer.objects.filter(Q(name='a') | Q(id=1)).canonical_sql())
+
+    def test_conditions_matching_nothing(self):
+        """
+        Conditions that match nothing in OR and negated nodes keep the sql of the query.
+        """
+        query_set = Manufacturer.objects.filter(Q(pk__in=[]) | Q(name='a'))
+        self.assertEqual(query_set.canonical_sql(), query_set.sql())
+        self.assertEqual(Manufacturer.objects.filter(Q(name='a') | Q(pk__in=[])).canonical_sql(),
+                         query_set.canonical_sql())
+        query_set = Manufacturer.objects.exclude(pk__in=[])
+        self.assertEqual(query_set.canonical_sql(), query_set.sql())
+        query_set = Manufacturer.objects.exclude(Q(pk__in=[]) | Q(name='a'))
+        self.assertEqual(query_set.canonical_sql(), query_set.sql())
+
+    @patch('django_cache_manager.mixins.model_cache_backend')
+    def test_canonical_keys_option(self, mock_model_cache):
+        """
+        Equivalent queries have the same key with the canonical_keys option.
+        """
+        mock_model_cache.retrieve_model_cache_info.return_value = ModelCacheInfo('tests_manufacturer', 'unique_id')
+        query_set1 = Manufacturer.objects.filter(name='a').filter(id__in=[2, 1])
+        query_set2 = Manufacturer.objects.filter(id__in=[1, 2]).filter(name='a')
+        self.assertNotEqual(query_set1.generate_key(), query_set2.generate_key())
+        with override_settings(DJANGO_CACHE_MANAGER={'canonical_keys': True}):
+            self.assertEqual(query_set1.generate_key(), query_set2.generate_key())
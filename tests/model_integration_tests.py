@@ -4,12 +4,14 @@
 Integration tests for models using CacheManager
 """
 import django
+from mock import patch
 from django.forms.models import model_to_dict
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import (
     connection,
     reset_queries
 )
+from django.db.models import Q
 from django.db.models.sql import EmptyResultSet
 from django.test import TestCase
 if django.get_version() > '1.7':
@@ -17,10 +19,15 @@ if django.get_version() > '1.7':
 else:
     from django.test.utils import override_settings
 
+from django_cache_manager.cache_manager import CachingQuerySet
+from django_cache_manager.types import EmptyResult
 from tests.models import(
+    Auto,
     Car,
+    Country,
     Driver,
     Engine,
+    Maker,
     Manufacturer,
 )
 from tests.factories import(
@@ -283,3 +290,317 @@ class EmptyResultSetTests(TestCase):
         handle the EmptyResultSet exception and return None.
         """
         self.assertEqual([], list(Car.objects.filter(make__in=[])))
+
+
+@override_settings(DEBUG=True)
+class PrefetchGraphCacheTests(TestCase):
+    """
+    Tests for caching query sets together with prefetch_related lookups
+    """
+
+    def setUp(self):
+        self.manufacturer = ManufacturerFactory.create()
+        self.engine = EngineFactory.create(name='V8')
+        self.car = CarFactory.create(make=self.manufacturer, engine=self.engine)
+        reset_queries()
+
+    def get_engine_names(self):
+        manufacturers = Manufacturer.objects.prefetch_related('cars__engine').cache_options(cache_prefetch=True)
+        return [car.engine.name for m in manufacturers for car in m.cars.all()]
+
+    def test_prefetch_graph_cache_hit(self):
+        """
+        Prefetched object graph is loaded from a single cache entry on repeated queries.
+        """
+        self.assertEqual(self.get_engine_names(), ['V8'])
+        reset_queries()
+        for i in range(5):
+            self.assertEqual(self.get_engine_names(), ['V8'])
+        self.assertEqual(len(connection.queries), 0)
+
+    def test_prefetch_graph_invalidated_by_related_table(self):
+        """
+        Prefetched object graph is invalidated when any table in the graph changes.
+        """
+        self.get_engine_names()
+        self.engine.name = 'V12'
+        self.engine.save()
+        self.assertEqual(self.get_engine_names(), ['V12'])
+
+    def test_prefetch_graph_disabled(self):
+        """
+        Prefetch lookups are cached individually when cache_prefetch is not set.
+        """
+        len(Manufacturer.objects.prefetch_related('cars__engine'))
+        reset_queries()
+        with patch.object(CachingQuerySet, 'generate_prefetch_key') as mock_generate_prefetch_key:
+            len(Manufacturer.objects.prefetch_related('cars__engine'))
+        self.assertEqual(mock_generate_prefetch_key.call_count, 0)
+
+
+@override_settings(DEBUG=True, DJANGO_CACHE_MANAGER={'cache_related_collections': True})
+class RelatedCollectionCacheTests(TestCase):
+    """
+    Tests for caching collections of related objects by parent
+    """
+
+    def setUp(self):
+        self.manufacturers = ManufacturerFactory.create_batch(size=2)
+        self.cars = [CarFactory.create(make=manufacturer) for manufacturer in self.manufacturers]
+        self.drivers = [DriverFactory.create(cars=[car]) for car in self.cars]
+        reset_queries()
+
+    def count_queries(self, query_set):
+        reset_queries()
+        list(query_set)
+        return len(connection.queries)
+
+    def test_reverse_foreign_key_collection_cache_hit(self):
+        """
+        Collection of a parent is cached.
+        """
+        list(self.manufacturers[0].cars.all())
+        self.assertEqual(self.count_queries(self.manufacturers[0].cars.all()), 0)
+
+    def test_save_invalidates_only_parent_collection(self):
+        """
+        Saving a related object invalidates the collection of its parent only.
+        """
+        list(self.manufacturers[0].cars.all())
+        list(self.manufacturers[1].cars.all())
+        self.cars[1].year = 1999
+        self.cars[1].save()
+        self.assertEqual(self.count_queries(self.manufacturers[0].cars.all()), 0)
+        self.assertEqual(self.count_queries(self.manufacturers[1].cars.all()), 1)
+
+    def test_foreign_key_change_invalidates_previous_parent(self):
+        """
+        Moving a related object to another parent invalidates the collections of both parents.
+        """
+        list(self.manufacturers[0].cars.all())
+        list(self.manufacturers[1].cars.all())
+        car = Car.objects.get(id=self.cars[0].id)
+        car.make = self.manufacturers[1]
+        car.save()
+        self.assertEqual(list(self.manufacturers[0].cars.all()), [])
+        self.assertEqual(len(self.manufacturers[1].cars.all()), 2)
+
+    def test_bulk_update_invalidates_collections(self):
+        """
+        Bulk updates invalidate the collections of all parents.
+        """
+        list(self.manufacturers[0].cars.all())
+        Car.objects.filter(id=self.cars[0].id).update(make=self.manufacturers[1])
+        self.assertEqual(list(self.manufacturers[0].cars.all()), [])
+
+    def test_many_to_many_change_invalidates_only_parent_collection(self):
+        """
+        Adding to a many-to-many relation invalidates the collections of the affected parents only.
+        """
+        list(self.drivers[0].cars.all())
+        list(self.drivers[1].cars.all())
+        self.drivers[1].cars.add(self.cars[0])
+        self.assertEqual(self.count_queries(self.drivers[0].cars.all()), 0)
+        self.assertEqual(len(self.drivers[1].cars.all()), 2)
+        self.assertEqual(len(self.cars[0].driver_set.all()), 2)
+
+    def test_many_to_many_target_save_invalidates_collection(self):
+        """
+        Saving an object listed through an intermediate table invalidates the collections listing it.
+        """
+        self.assertEqual([car.year for car in self.drivers[0].cars.all()], [self.cars[0].year])
+        self.cars[0].year = 1999
+        self.cars[0].save()
+        self.assertEqual([car.year for car in self.drivers[0].cars.all()], [1999])
+
+    def test_foreign_key_of_joined_table(self):
+        """
+        Filters on a foreign key of a joined table that does not reference the model see rows move.
+        """
+        country = Country.objects.create(name='de')
+        makers = [Maker.objects.create(name=name, country=country) for name in ('a', 'b')]
+        auto = Auto.objects.create(maker=makers[0])
+        self.assertEqual(len(Auto.objects.filter(maker__country=country)), 1)
+        auto.maker = Maker.objects.create(name='c', country=Country.objects.create(name='fr'))
+        auto.save()
+        self.assertEqual(list(Auto.objects.filter(maker__country=country)), [])
+
+
+@override_settings(DEBUG=True, DJANGO_CACHE_MANAGER={'superset_max_rows': 10})
+class SupersetCacheTests(TestCase):
+    """
+    Tests for serving sliced and projected queries from cached full results
+    """
+
+    def setUp(self):
+        self.manufacturers = ManufacturerFactory.create_batch(size=5)
+        self.ids = [m.id for m in Manufacturer.objects.order_by('id')]
+        reset_queries()
+
+    def test_slice_from_superset(self):
+        """
+        Slices are served from the cached result of the query without limits.
+        """
+        query_set = Manufacturer.objects.order_by('id')
+        list(query_set)
+        reset_queries()
+        self.assertEqual([m.id for m in query_set[1:3]], self.ids[1:3])
+        self.assertEqual(query_set[4].id, self.ids[4])
+        self.assertEqual([m.id for m in query_set[3:]], self.ids[3:])
+        self.assertEqual(len(connection.queries), 0)
+
+    def test_projection_from_superset(self):
+        """
+        only() and defer() queries are served from the cached result with all fields.
+        """
+        names = [m.name for m in Manufacturer.objects.order_by('id')]
+        reset_queries()
+        self.assertEqual([m.name for m in Manufacturer.objects.order_by('id').only('name')], names)
+        self.assertEqual([m.name for m in Manufacturer.objects.order_by('id').defer('name')], names)
+        self.assertEqual(len(connection.queries), 0)
+
+    def test_superset_too_large(self):
+        """
+        Queries are not served from cached results with more than superset_max_rows rows.
+        """
+        list(Manufacturer.objects.order_by('id'))
+        reset_queries()
+        with override_settings(DJANGO_CACHE_MANAGER={'superset_max_rows': 2}):
+            list(Manufacturer.objects.order_by('id')[1:3])
+        self.assertEqual(len(connection.queries), 1)
+
+    def test_superset_not_cached(self):
+        """
+        Slices are queried and cached when the full result is not cached.
+        """
+        self.assertEqual([m.id for m in Manufacturer.objects.order_by('-id')[:2]], self.ids[:-3:-1])
+        self.assertEqual(len(connection.queries), 1)
+        list(Manufacturer.objects.order_by('-id')[:2])
+        self.assertEqual(len(connection.queries), 1)
+
+
+@override_settings(DEBUG=True)
+class NegativeCacheTests(TestCase):
+    """
+    Tests for caching of queries without results
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        reset_queries()
+
+    def test_get_does_not_exist(self):
+        """
+        get() of a missing row is served from a cached tombstone.
+        """
+        for i in range(2):
+            self.assertRaises(ObjectDoesNotExist, Manufacturer.objects.get, name='Ford')
+        self.assertEqual(len(connection.queries), 1)
+        query_set = Manufacturer.objects.filter(name='Ford')
+        self.assertTrue(isinstance(query_set.cache_backend.get(query_set.generate_key()), EmptyResult))
+
+    def test_negative_timeout(self):
+        """
+        Tombstones are cached for negative_timeout seconds.
+        """
+        query_set = Manufacturer.objects.filter(name='Ford')
+        with override_settings(DJANGO_CACHE_MANAGER={'negative_timeout': 10}):
+            with patch.object(query_set.cache_backend, 'set') as cache_set:
+                list(query_set)
+        self.assertEqual(cache_set.call_args[0][2], 10)
+
+    def test_tombstone_invalidated(self):
+        """
+        Tombstones are invalidated with the table.
+        """
+        self.assertEqual(list(Manufacturer.objects.filter(name='Ford')), [])
+        ManufacturerFactory.create(name='Ford')
+        self.assertEqual(len(Manufacturer.objects.filter(name='Ford')), 1)
+
+
+@override_settings(DEBUG=True)
+class ReadReplicaTests(TestCase):
+    """
+    Tests for caching of results read from replicas. The default database acts as a replica of 'primary'.
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        reset_queries()
+
+    def test_shared_replica_results(self):
+        """
+        With share_replica_results, results of a replica are keyed by its primary.
+        """
+        query_set = Manufacturer.objects.filter(name='Tesla')
+        key = query_set.generate_key()
+        with override_settings(DJANGO_CACHE_MANAGER={'read_replicas': {'default': 'primary'},
+                                                     'share_replica_results': True}):
+            self.assertEqual(query_set.cache_database(), 'primary')
+            self.assertNotEqual(query_set.generate_key(), key)
+        with override_settings(DJANGO_CACHE_MANAGER={'read_replicas': {'default': 'primary'}}):
+            self.assertEqual(query_set.generate_key(), key)
+
+    def test_not_cached_within_replica_lag(self):
+        """
+        Results read from a replica right after a write are not cached, or cached for replica_lag_timeout.
+        """
+        ManufacturerFactory.create(name='Ford')
+        reset_queries()
+        options = {'read_replicas': {'default': 'primary'}, 'replica_lag': 10}
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            for i in range(2):
+                list(Manufacturer.objects.filter(name='Tesla'))
+            self.assertEqual(len(connection.queries), 2)
+            query_set = Manufacturer.objects.filter(name='Tesla')
+            with patch.object(query_set.cache_backend, 'set') as cache_set:
+                list(query_set.cache_options(replica_lag_timeout=2))
+            self.assertEqual(cache_set.call_args[0][2], 2)
+        with override_settings(DJANGO_CACHE_MANAGER=dict(options, replica_lag=0.001)):
+            for i in range(2):
+                list(Manufacturer.objects.filter(name='Tesla'))
+            self.assertEqual(len(connection.queries), 4)
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'dedup_related': True})
+class DedupRelatedTests(TestCase):
+    """
+    Tests for sharing of related instances in cached select_related results
+    """
+
+    def setUp(self):
+        manufacturer = ManufacturerFactory.create(name='Tesla')
+        for i in range(3):
+            CarFactory.create(make=manufacturer)
+
+    def test_related_instances_shared(self):
+        """
+        Related instances with the same primary key are a single instance in cached results.
+        """
+        query_set = Car.objects.select_related('make', 'engine')
+        list(query_set._clone())
+        cars = query_set._get_cached_entry(query_set.generate_key()).result_set
+        self.assertEqual(len(cars), 3)
+        self.assertTrue(cars[0].make is cars[1].make is cars[2].make)
+        self.assertEqual(len(set(id(car.engine) for car in cars)), 3)
+        self.assertEqual(cars[0].make.name, 'Tesla')
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'canonical_keys': True})
+class CanonicalKeyCacheTests(TestCase):
+    """
+    Tests of CachingQuerySet with canonical keys
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='a')
+        ManufacturerFactory.create(name='b')
+
+    def test_conditions_matching_nothing(self):
+        """
+        Conditions that match nothing in OR and negated nodes do not empty the result.
+        """
+        self.assertEqual([m.name for m in Manufacturer.objects.filter(Q(pk__in=[]) | Q(name='a'))], ['a'])
+        self.assertEqual(len(Manufacturer.objects.exclude(pk__in=[])), 2)
+        self.assertEqual([m.name for m in Manufacturer.objects.exclude(Q(pk__in=[]) | Q(name='a'))], ['b'])
+        self.assertEqual(list(Manufacturer.objects.filter(pk__in=[])), [])
@@ -60,3 +60,21 @@ class Membership(models.Model):
 
     objects = CacheManager()
 
+
+class Country(models.Model):
+    name = models.CharField(max_length=128)
+
+    objects = CacheManager()
+
+
+class Maker(models.Model):
+    name = models.CharField(max_length=128)
+    country = models.ForeignKey(Country)
+
+    objects = CacheManager()
+
+
+class Auto(models.Model):
+    maker = models.ForeignKey(Maker)
+
+    objects = CacheManager()
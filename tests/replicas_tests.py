@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager.model_cache_sharing import model_cache_backend
+from django_cache_manager.replicas import random_replica_key, replica_keys
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+HOT_OPTIONS = {
+    'models': {
+        'tests.Manufacturer': {'hot_replicas': 3},
+    },
+}
+
+
+class ReplicaKeyTests(TestCase):
+    """
+    Tests for django_cache_manager.replicas
+    """
+
+    def test_replica_keys(self):
+        self.assertEqual(replica_keys('key', 3), ['key', 'key:1', 'key:2'])
+        self.assertEqual(replica_keys('key', 1), ['key'])
+
+    def test_random_replica_key(self):
+        self.assertEqual(random_replica_key('key', 1), 'key')
+        self.assertTrue(random_replica_key('key', 3) in replica_keys('key', 3))
+
+
+@override_settings(DJANGO_CACHE_MANAGER=HOT_OPTIONS)
+class HotReplicaTests(TestCase):
+    """
+    Tests of CachingQuerySet and SharedMemory with the hot_replicas option
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+
+    def test_entry_replicas(self):
+        """
+        Results are cached under all replica keys.
+        """
+        query_set = Manufacturer.objects.filter(name='Tesla')
+        list(query_set)
+        cache_key = query_set.generate_key()
+        for replica in replica_keys(cache_key, 3):
+            self.assertEqual(len(query_set.cache_backend.get(replica).result_set), 1)
+        for i in range(5):
+            self.assertEqual(len(Manufacturer.objects.filter(name='Tesla')), 1)
+
+    def test_table_key_replicas(self):
+        """
+        The key of the table is shared under all replica keys and read from a replica or the key itself.
+        """
+        table_name = Manufacturer._meta.db_table
+        cache_backend = model_cache_backend.cache_backend
+        table_key = cache_backend.get(table_name).table_key
+        for replica in replica_keys(table_name, 3):
+            self.assertEqual(cache_backend.get(replica).table_key, table_key)
+        cache_backend.delete(table_name + ':1')
+        cache_backend.delete(table_name + ':2')
+        for i in range(5):
+            info = model_cache_backend.retrieve_model_cache_info(table_name, replicas=3)
+            self.assertEqual(info.table_key, table_key)
+
+    def test_other_models_not_replicated(self):
+        """
+        Tables of models without the option are not replicated.
+        """
+        table_name = Manufacturer._meta.db_table
+        with self.settings(DJANGO_CACHE_MANAGER={}):
+            ManufacturerFactory.create(name='Ford')
+        self.assertNotEqual(model_cache_backend.cache_backend.get(table_name).table_key,
+                            model_cache_backend.cache_backend.get(table_name + ':1').table_key)
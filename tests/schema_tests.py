@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.db import models
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+from mock import MagicMock, patch
+
+from django_cache_manager.schema import model_fingerprint
+from tests.models import Car, Manufacturer
+
+
+def fake_model(*fields):
+    model = MagicMock()
+    model._meta.app_label = 'tests'
+    model._meta.object_name = 'Fake'
+    model._meta.db_table = 'tests_fake'
+    model._meta.fields = list(fields)
+    model._meta.many_to_many = []
+    return model
+
+
+def fake_field(name, field_class):
+    field = field_class()
+    field.name = field.attname = field.column = name
+    return field
+
+
+class SchemaTests(TestCase):
+    """
+    Tests for django_cache_manager.schema
+    """
+
+    def test_model_fingerprint(self):
+        """
+        Fingerprints change with the fields of a model and their classes.
+        """
+        self.assertEqual(model_fingerprint(Car), model_fingerprint(Car))
+        self.assertNotEqual(model_fingerprint(Car), model_fingerprint(Manufacturer))
+        fingerprints = set([
+            model_fingerprint(fake_model(fake_field('a', models.IntegerField))),
+            model_fingerprint(fake_model(fake_field('a', models.DecimalField))),
+            model_fingerprint(fake_model(fake_field('a', models.IntegerField), fake_field('b', models.IntegerField))),
+        ])
+        self.assertEqual(len(fingerprints), 3)
+
+    def test_schema_keys(self):
+        """
+        With schema_keys, keys include the fingerprints of the model and of the models of select_related.
+        """
+        query_set = Car.objects.select_related('make')
+        key = query_set.generate_key()
+        with override_settings(DJANGO_CACHE_MANAGER={'schema_keys': True}):
+            self.assertNotEqual(query_set.generate_key(), key)
+            fingerprint = query_set.schema_fingerprint()
+            self.assertEqual(Car.objects.all().schema_fingerprint(), model_fingerprint(Car))
+        if django.VERSION >= (1, 8):
+            self.assertEqual(fingerprint, model_fingerprint(Car) + model_fingerprint(Manufacturer))
+
+    def test_schema_keys_of_prefetched_models(self):
+        """
+        Prefetch keys change with the schema of the prefetched models.
+        """
+        if django.VERSION < (1, 8):
+            return
+        query_set = Manufacturer.objects.prefetch_related('cars')
+        with override_settings(DJANGO_CACHE_MANAGER={'schema_keys': True}):
+            key = query_set.generate_prefetch_key()
+            changed = lambda model: 'changed' if model is Car else model_fingerprint(model)
+            with patch('django_cache_manager.mixins.model_fingerprint', side_effect=changed):
+                self.assertNotEqual(query_set.generate_prefetch_key(), key)
@@ -36,7 +36,12 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
         'LOCATION': cache_location,
         'TIMEOUT': 1800
-    }
+    },
+    # alias for routing tests
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django_cache_manager_local',
+    },
 }
 LANGUAGE_CODE = 'en-us'
 
@@ -2,7 +2,8 @@
 
 from unittest import TestCase
 
-from django_cache_manager.model_cache_sharing import model_cache_backend
+from django_cache_manager.model_cache_sharing import DEFAULT_BACKEND, load_backend, model_cache_backend
+from django_cache_manager.model_cache_sharing.backends.shared_memory import SharedMemory
 from django_cache_manager.model_cache_sharing.types import ModelCacheInfo
 
 class SharedMemoryTests(TestCase):
@@ -67,3 +68,10 @@ class SharedMemoryTests(TestCase):
         )
         self.assertEqual(cached_model, None)
 
+    def test_load_backend(self):
+        """
+        The default sharing backend is SharedMemory
+        """
+        backend = load_backend(DEFAULT_BACKEND)
+        self.assertTrue(isinstance(backend, SharedMemory))
+        self.assertTrue(isinstance(model_cache_backend, SharedMemory))
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from django_cache_manager import stats
+from django_cache_manager.signals import query_stats
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'stats': True, 'stats_sizes': True})
+class StatsTests(TestCase):
+    """
+    Tests for django_cache_manager.stats
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        stats.reset()
+
+    def test_hits_and_misses(self):
+        """
+        Hits, misses and timings are counted for the model.
+        """
+        for i in range(3):
+            list(Manufacturer.objects.filter(name='Tesla'))
+        model_stats = stats.get_stats('tests.Manufacturer')
+        self.assertEqual(model_stats['misses'], 1)
+        self.assertEqual(model_stats['hits'], 2)
+        self.assertEqual(model_stats['db']['count'], 1)
+        self.assertEqual(model_stats['cache_get']['count'], 3)
+        self.assertEqual(model_stats['key_generation']['count'], 3)
+        self.assertTrue(model_stats['bytes_written'] > 0)
+        self.assertEqual(model_stats['bytes_read'], 2 * model_stats['bytes_written'])
+
+    def test_empty_result(self):
+        """
+        Queries known to return nothing are counted as empty.
+        """
+        list(Manufacturer.objects.filter(name__in=[]))
+        self.assertEqual(stats.get_stats('tests.Manufacturer')['empty'], 1)
+
+    def test_query_stats(self):
+        """
+        Statistics are kept for each query.
+        """
+        list(Manufacturer.objects.filter(name='Tesla'))
+        list(Manufacturer.objects.all())
+        self.assertEqual(len(stats.get_query_stats('tests.Manufacturer')), 2)
+
+    def test_signal(self):
+        """
+        Each evaluation is sent as the query_stats signal.
+        """
+        outcomes = []
+
+        def receiver(sender, outcome, **kwargs):
+            outcomes.append((sender, outcome))
+        query_stats.connect(receiver)
+        try:
+            list(Manufacturer.objects.filter(name='Tesla'))
+            list(Manufacturer.objects.filter(name='Tesla'))
+        finally:
+            query_stats.disconnect(receiver)
+        self.assertEqual(outcomes, [(Manufacturer, 'miss'), (Manufacturer, 'hit')])
+
+    def test_disabled(self):
+        """
+        No statistics are collected when the stats option is not enabled.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER={}):
+            list(Manufacturer.objects.all())
+        self.assertEqual(stats.get_stats(), {})
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from django_cache_manager import tracing
+from django_cache_manager.middleware import TraceMiddleware
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class TracingTests(TestCase):
+    """
+    Tests for django_cache_manager.tracing and TraceMiddleware
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+
+    def tearDown(self):
+        tracing.stop()
+
+    def test_trace(self):
+        """
+        Evaluations and invalidations are traced without the stats option.
+        """
+        trace = tracing.start()
+        for i in range(3):
+            list(Manufacturer.objects.filter(name='Tesla'))
+        ManufacturerFactory.create(name='Ford')
+        self.assertEqual(tracing.stop(), trace)
+        summary = trace.as_dict()
+        self.assertEqual(summary['queries'], 3)
+        self.assertEqual(summary['hits'], 2)
+        self.assertEqual(summary['misses'], 1)
+        self.assertTrue(Manufacturer._meta.db_table in summary['invalidated'])
+        self.assertEqual(list(summary['repeated'].values()), [3])
+
+    def test_no_trace(self):
+        """
+        Nothing is traced outside of start and stop.
+        """
+        list(Manufacturer.objects.all())
+        self.assertEqual(tracing.current(), None)
+
+    def test_middleware(self):
+        """
+        The middleware reports the trace of the request in a Server-Timing header.
+        """
+        middleware = TraceMiddleware()
+        request = RequestFactory().get('/')
+        middleware.process_request(request)
+        list(Manufacturer.objects.all())
+        response = middleware.process_response(request, HttpResponse())
+        self.assertTrue(response['Server-Timing'].startswith('cache;desc="1 queries, 0 hits, 1 misses'))
+        self.assertTrue('cache_db;dur=' in response['Server-Timing'])
+        self.assertEqual(tracing.current(), None)
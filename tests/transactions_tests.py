@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import django
+from django.db import (
+    connection,
+    reset_queries,
+    transaction,
+)
+from django.test import TestCase, TransactionTestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+
+from tests.factories import EngineFactory, ManufacturerFactory
+from tests.models import Engine, Manufacturer
+
+
+@override_settings(DEBUG=True, DJANGO_CACHE_MANAGER={'transaction_aware': True})
+class TransactionTests(TestCase):
+    """
+    Tests of CachingQuerySet in the transaction of a test case
+    """
+
+    def setUp(self):
+        ManufacturerFactory.create(name='Tesla')
+        reset_queries()
+
+    def test_results_not_cached_before_commit(self):
+        """
+        Results read in a transaction are not cached while it runs.
+        """
+        query_set = Engine.objects.all()
+        list(query_set._clone())
+        self.assertEqual(query_set.cache_backend.get(query_set.generate_key()), None)
+
+    def test_read_your_writes(self):
+        """
+        Queries of tables written by the transaction are served from the database and then from the transaction.
+        """
+        list(Manufacturer.objects.filter(name='Tesla'))
+        ManufacturerFactory.create(name='Tesla')
+        reset_queries()
+        for i in range(2):
+            self.assertEqual(len(Manufacturer.objects.filter(name='Tesla')), 2)
+        # the end of a transaction can only be told by its on_commit hook, django < 1.9 serves every query
+        # in atomic blocks from the database
+        self.assertEqual(len(connection.queries), 1 if django.VERSION >= (1, 9) else 2)
+        query_set = Manufacturer.objects.filter(name='Tesla')
+        self.assertEqual(query_set.cache_backend.get(query_set.generate_key()), None)
+
+
+@override_settings(DJANGO_CACHE_MANAGER={'transaction_aware': True})
+class TransactionCommitTests(TransactionTestCase):
+    """
+    Tests of CachingQuerySet on commit and rollback
+    """
+
+    def test_commit(self):
+        """
+        Written tables are invalidated on commit and results of other tables are cached.
+        """
+        EngineFactory.create()
+        with transaction.atomic():
+            ManufacturerFactory.create(name='Tesla')
+            manufacturers = Manufacturer.objects.all()
+            list(manufacturers._clone())
+            key = manufacturers.generate_key()
+            engines = Engine.objects.all()
+            list(engines._clone())
+            self.assertEqual(engines.cache_backend.get(engines.generate_key()), None)
+        if django.VERSION >= (1, 9):
+            self.assertNotEqual(manufacturers.generate_key(), key)
+            self.assertEqual(len(engines.cache_backend.get(engines.generate_key()).result_set), 1)
+
+    def test_rollback(self):
+        """
+        Results read in a transaction that is rolled back are not cached.
+        """
+        EngineFactory.create()
+        engines = Engine.objects.all()
+        try:
+            with transaction.atomic():
+                list(engines._clone())
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(engines.cache_backend.get(engines.generate_key()), None)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+
+import django
+from django.core.management import call_command
+from django.db import (
+    connection,
+    reset_queries
+)
+from django.test import TestCase
+if django.get_version() > '1.7':
+    from django.test import override_settings
+else:
+    from django.test.utils import override_settings
+from django.core.signing import BadSignature
+from django.utils.six import StringIO
+from mock import patch
+
+from django_cache_manager.warmup import (
+    QueryRecorder,
+    RateLimiter,
+    load_manifest,
+    most_common,
+    recorder,
+    warm,
+)
+from tests.factories import ManufacturerFactory
+from tests.models import Manufacturer
+
+
+class WarmupTests(TestCase):
+    """
+    Tests for django_cache_manager.warmup
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.tmp_dir, 'manifest.json')
+        self.options = {
+            'warmup_manifest': self.manifest,
+            'warmup_sample_rate': 1,
+        }
+        self.manufacturer = ManufacturerFactory.create(name='Tesla')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_save(self):
+        """
+        Recorded queries are saved with the number of times they were served.
+        """
+        query_recorder = QueryRecorder()
+        with override_settings(DJANGO_CACHE_MANAGER=self.options):
+            for i in range(3):
+                query_recorder.record(Manufacturer.objects.filter(name='Tesla'))
+            query_recorder.record(Manufacturer.objects.all())
+        query_recorder.save(self.manifest)
+        counts = [entry['count'] for entry in most_common(load_manifest(self.manifest))]
+        self.assertEqual(counts, [3, 1])
+
+    def test_save_merges_manifest(self):
+        """
+        Saving merges the recorded queries with the queries already in the manifest.
+        """
+        query_recorder = QueryRecorder()
+        with override_settings(DJANGO_CACHE_MANAGER=self.options):
+            query_recorder.record(Manufacturer.objects.all())
+            query_recorder.save(self.manifest)
+            query_recorder.record(Manufacturer.objects.all())
+            query_recorder.save(self.manifest)
+        self.assertEqual([entry['count'] for entry in load_manifest(self.manifest).values()], [2])
+
+    def test_unwritable_manifest(self):
+        """
+        Queries are served when the manifest can not be written, and the recorded queries are kept.
+        """
+        query_recorder = QueryRecorder()
+        manifest = os.path.join(self.tmp_dir, 'missing', 'manifest.json')
+        options = dict(self.options, warmup_manifest=manifest, warmup_save_interval=1)
+        with override_settings(DJANGO_CACHE_MANAGER=options):
+            with patch('django_cache_manager.cache_manager.recorder', query_recorder):
+                for i in range(2):
+                    self.assertEqual(list(Manufacturer.objects.filter(name='Tesla')), [self.manufacturer])
+        self.assertFalse(os.path.exists(manifest))
+        os.mkdir(os.path.dirname(manifest))
+        query_recorder.save(manifest)
+        self.assertEqual([entry['count'] for entry in load_manifest(manifest).values()], [2])
+
+    def test_no_recording_without_manifest(self):
+        """
+        Queries are not recorded when warmup_manifest is not set.
+        """
+        query_recorder = QueryRecorder()
+        query_recorder.record(Manufacturer.objects.all())
+        self.assertEqual(query_recorder._queries, {})
+
+    @override_settings(DEBUG=True)
+    def test_warm_cache_command(self):
+        """
+        warm_cache command caches the queries of the manifest.
+        """
+        with override_settings(DJANGO_CACHE_MANAGER=self.options):
+            list(Manufacturer.objects.filter(name='Tesla'))
+        recorder.save(self.manifest)
+        Manufacturer.objects.invalidate_model_cache()
+        out = StringIO()
+        call_command('warm_cache', manifest=self.manifest, workers=1, stdout=out)
+        self.assertIn('Warmed 1 of 1 queries', out.getvalue())
+        reset_queries()
+        self.assertEqual(list(Manufacturer.objects.filter(name='Tesla')), [self.manufacturer])
+        self.assertEqual(len(connection.queries), 0)
+
+    def test_unsigned_queries_not_loaded(self):
+        """
+        Queries whose signature does not match are not unpickled.
+        """
+        query_recorder = QueryRecorder()
+        with override_settings(DJANGO_CACHE_MANAGER=self.options):
+            query_recorder.record(Manufacturer.objects.all())
+        query_recorder.save(self.manifest)
+        entry = most_common(load_manifest(self.manifest))[0]
+        self.assertEqual(warm(entry), 1)
+        payload, signature = entry['query'].rsplit(':', 1)
+        with patch('django_cache_manager.warmup.pickle.loads') as loads:
+            for query in (payload, payload + ':' + 'x' * len(signature)):
+                self.assertRaises(BadSignature, warm, dict(entry, query=query))
+            self.assertFalse(loads.called)
+
+    def test_rate_limiter(self):
+        """
+        Rate limiter spaces calls by the interval of the rate.
+        """
+        rate_limiter = RateLimiter(100)
+        start = time.time()
+        for i in range(3):
+            rate_limiter.wait()
+        self.assertTrue(time.time() - start >= 0.019)